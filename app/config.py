@@ -1,19 +1,64 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
 
 class Settings(BaseSettings):
     # Ollama
     ollama_base_url: str = "http://localhost:11434"
     ollama_model: str = "llama3.1"
+    ollama_timeout: float = 60.0
+    ollama_max_connections: int = 20
+    llm_max_concurrency: int = 4
+    llm_max_queue: int = 32
+    llm_queue_timeout: float = 10.0
     
     # Qdrant
     qdrant_host: str = "localhost"
     qdrant_port: int = 6333
     qdrant_collection_name: str = "documents"
+    qdrant_quantization: str = "none"  # "none", "scalar" (int8) or "binary"
+    qdrant_on_disk: bool = False
+    qdrant_hnsw_m: int = 16
+    qdrant_hnsw_ef_construct: int = 100
+    qdrant_hnsw_ef: Optional[int] = None
+    qdrant_oversampling: float = 2.0
+    qdrant_rescore: bool = True
+    
+    # Vector backend: "qdrant" or "local" (embedded memory-mapped index)
+    vector_backend: str = "qdrant"
+    local_index_path: str = "data/vector_index"
+    local_index_dtype: str = "float32"
+    local_index_ivf_lists: int = 0
+    local_index_ivf_nprobe: int = 8
     
     # Embeddings
     embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
     embedding_dimension: int = 384
+    embedding_max_workers: int = 4
+    embedding_batch_max_size: int = 32
+    embedding_batch_max_wait_ms: float = 5.0
+    
+    # Retrieval
+    retrieval_score_threshold: float = 0.6
+    hybrid_retrieval_enabled: bool = True
+    lexical_index_path: str = "data/lexical_index"
+    lexical_min_score: float = 1.0
+    rrf_k: int = 60
+    
+    # Context assembly (the prompt template and answer need room in num_ctx)
+    context_max_tokens: int = 1500
+    context_duplicate_threshold: float = 0.95
+    
+    # Ingestion
+    ingest_batch_size: int = 64
+    upload_chunk_size: int = 1024 * 1024
+    
+    # Caching
+    embedding_cache_size: int = 10000
+    embedding_cache_ttl_seconds: float = 3600
+    answer_cache_size: int = 1000
+    answer_cache_ttl_seconds: float = 600
+    answer_cache_max_distance: float = 0.05
     
     # App
     app_host: str = "0.0.0.0"
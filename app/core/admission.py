@@ -0,0 +1,159 @@
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Deque, Dict, Hashable, List
+import asyncio
+import math
+import time
+
+class Overloaded(Exception):
+    """The LLM gate couldn't admit a request
+    
+    status_code is 429 when the wait queue is full and 503 when the request
+    waited longer than the queue timeout; retry_after is a hint in seconds.
+    """
+    
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class LLMGate:
+    """Single-flight coalescing plus bounded concurrency for LLM generations
+    
+    Identical concurrent requests (same key) share one generation. Distinct
+    ones run at most max_concurrency at a time; up to max_queue more wait in
+    FIFO order, and anything beyond that is rejected immediately instead of
+    piling up behind Ollama's own queue.
+    """
+    
+    def __init__(self, max_concurrency: int = 4, max_queue: int = 32,
+                 queue_timeout: float = 10.0):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # key -> [task, number of callers awaiting it]
+        self._inflight: Dict[Hashable, List] = {}
+        
+        # Stats
+        self._admitted = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._coalesced = 0
+        self._total_wait = 0.0
+        self._max_wait_seen = 0.0
+        self._total_service = 0.0
+        self._served = 0
+    
+    def _retry_after(self) -> int:
+        """Seconds until a slot is likely free, from the mean generation time"""
+        mean_service = self._total_service / self._served if self._served else 1.0
+        backlog = (len(self._waiters) + 1) / self.max_concurrency
+        return max(1, math.ceil(mean_service * backlog))
+    
+    async def acquire(self):
+        """Take a concurrency slot, waiting in the queue if needed"""
+        started = time.perf_counter()
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            self._record_admit(0.0)
+            return
+        
+        if len(self._waiters) >= self.max_queue:
+            self._rejected += 1
+            raise Overloaded("LLM queue is full", 429, self._retry_after())
+        
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._timed_out += 1
+            raise Overloaded("Timed out waiting for the LLM", 503, self._retry_after())
+        except asyncio.CancelledError:
+            # The slot may have been handed over just as we were cancelled
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        # release() transferred its slot to us without decrementing _active
+        self._record_admit(time.perf_counter() - started)
+    
+    def release(self):
+        """Hand the slot to the next live waiter, or free it"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+    
+    def _record_admit(self, wait: float):
+        self._admitted += 1
+        self._total_wait += wait
+        self._max_wait_seen = max(self._max_wait_seen, wait)
+    
+    @asynccontextmanager
+    async def slot(self):
+        """Hold a concurrency slot for the duration of the block"""
+        await self.acquire()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._total_service += time.perf_counter() - started
+            self._served += 1
+            self.release()
+    
+    async def _admitted_call(self, factory: Callable[[], Awaitable]):
+        async with self.slot():
+            return await factory()
+    
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable]):
+        """Run factory() under admission control, sharing it with identical callers"""
+        entry = self._inflight.get(key)
+        if entry is None:
+            task = asyncio.get_running_loop().create_task(self._admitted_call(factory))
+            entry = [task, 0]
+            self._inflight[key] = entry
+            
+            def forget(_):
+                if self._inflight.get(key) is entry:
+                    del self._inflight[key]
+            task.add_done_callback(forget)
+        else:
+            self._coalesced += 1
+        
+        entry[1] += 1
+        try:
+            # Shielded so one caller disconnecting doesn't cancel it for the others
+            return await asyncio.shield(entry[0])
+        except asyncio.CancelledError:
+            if entry[1] == 1 and not entry[0].done():
+                entry[0].cancel()
+            raise
+        finally:
+            entry[1] -= 1
+    
+    def stats(self) -> Dict:
+        """Concurrency, queue and coalescing statistics"""
+        return {
+            "active": self._active,
+            "queue_depth": len(self._waiters),
+            "inflight_keys": len(self._inflight),
+            "admitted": self._admitted,
+            "rejected": self._rejected,
+            "timed_out": self._timed_out,
+            "coalesced": self._coalesced,
+            "mean_queue_wait_ms": 1000 * self._total_wait / self._admitted if self._admitted else 0.0,
+            "max_queue_wait_ms": 1000 * self._max_wait_seen,
+            "mean_generation_ms": 1000 * self._total_service / self._served if self._served else 0.0,
+            "config": {
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "queue_timeout": self.queue_timeout
+            }
+        }
@@ -0,0 +1,122 @@
+from app.core.embeddings import EmbeddingGenerator
+from typing import Dict, List, Optional
+import asyncio
+import time
+
+class EmbeddingBatcher:
+    """Coalesces concurrent single-text embedding requests into one encode call"""
+    
+    def __init__(self, embedding_generator: EmbeddingGenerator,
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.embedding_generator = embedding_generator
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # Stats
+        self._requests = 0
+        self._batches = 0
+        self._max_batch_size_seen = 0
+        self._batch_sizes: Dict[int, int] = {}
+        self._total_wait = 0.0
+        self._max_wait_seen = 0.0
+    
+    def _ensure_worker(self):
+        """Start the batching worker on the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+    
+    async def agenerate_single(self, text: str) -> List[float]:
+        """Queue a text for the next batch and wait for its embedding"""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((text, future, time.perf_counter()))
+        return await future
+    
+    async def _collect_batch(self) -> List:
+        """Wait for one request, then gather more until the batch is full or max_wait passes"""
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        
+        return batch
+    
+    async def _run(self):
+        """Batching loop: one encode() call per collected batch"""
+        while True:
+            batch = await self._collect_batch()
+            # Callers that gave up (e.g. client disconnected) don't need encoding
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                continue
+            
+            started = time.perf_counter()
+            texts = [text for text, _, _ in batch]
+            try:
+                embeddings = await self.embedding_generator.agenerate(texts)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for (_, future, _), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+            
+            self._record(batch, started)
+    
+    def _record(self, batch: List, started: float):
+        """Update batch size and queue wait stats"""
+        size = len(batch)
+        self._requests += size
+        self._batches += 1
+        self._max_batch_size_seen = max(self._max_batch_size_seen, size)
+        self._batch_sizes[size] = self._batch_sizes.get(size, 0) + 1
+        for _, _, enqueued in batch:
+            wait = started - enqueued
+            self._total_wait += wait
+            self._max_wait_seen = max(self._max_wait_seen, wait)
+    
+    def stats(self) -> Dict:
+        """Batch size and queue wait statistics"""
+        return {
+            "requests": self._requests,
+            "batches": self._batches,
+            "mean_batch_size": self._requests / self._batches if self._batches else 0.0,
+            "max_batch_size": self._max_batch_size_seen,
+            "batch_size_counts": dict(sorted(self._batch_sizes.items())),
+            "mean_queue_wait_ms": 1000 * self._total_wait / self._requests if self._requests else 0.0,
+            "max_queue_wait_ms": 1000 * self._max_wait_seen,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "config": {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000
+            }
+        }
+    
+    async def aclose(self):
+        """Stop the batching worker"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except (asyncio.CancelledError, RuntimeError):
+                pass
+            self._worker = None
@@ -0,0 +1,157 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import threading
+import time
+import numpy as np
+
+def normalize_question(question: str) -> str:
+    """Normalize a question so trivially different spellings share a cache key"""
+    return " ".join(question.lower().split())
+
+class EmbeddingCache:
+    """LRU cache of normalized question -> embedding with TTL expiry"""
+    
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 3600):
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, question: str) -> Optional[List[float]]:
+        """Return the cached embedding for a question, if fresh"""
+        key = normalize_question(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, question: str, embedding: List[float]):
+        """Cache an embedding, evicting the least recently used entry when full"""
+        if self.max_size <= 0:
+            return
+        key = normalize_question(question)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Drop all cached embeddings"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+class SemanticAnswerCache:
+    """Answer cache keyed by question embedding, matched by cosine distance"""
+    
+    def __init__(self, max_size: int = 1000, ttl_seconds: float = 600,
+                 max_distance: float = 0.05):
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        # Fixed-capacity slot arrays, allocated once the dimension is known
+        self._vectors: Optional[np.ndarray] = None
+        self._top_k = np.zeros(max_size, dtype=np.int64)
+        self._expires = np.zeros(max_size, dtype=np.float64)
+        self._valid = np.zeros(max_size, dtype=bool)
+        self._results: List[Optional[Dict]] = [None] * max_size
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        # Bumped on every clear() so in-flight queries can't repopulate stale answers
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def _unit(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def get(self, embedding: List[float], top_k: int) -> Optional[Dict]:
+        """Return a cached result whose question is within max_distance of this one"""
+        with self._lock:
+            if self._vectors is None or not self._lru:
+                self.misses += 1
+                return None
+            
+            now = time.monotonic()
+            expired = self._valid & (self._expires < now)
+            for slot in np.flatnonzero(expired):
+                self._evict(int(slot))
+            
+            candidates = self._valid & (self._top_k == top_k)
+            if not candidates.any():
+                self.misses += 1
+                return None
+            
+            similarities = self._vectors @ self._unit(embedding)
+            similarities[~candidates] = -np.inf
+            slot = int(np.argmax(similarities))
+            if 1.0 - similarities[slot] > self.max_distance:
+                self.misses += 1
+                return None
+            
+            self._lru.move_to_end(slot)
+            self.hits += 1
+            return self._results[slot]
+    
+    def put(self, embedding: List[float], top_k: int, result: Dict,
+            generation: Optional[int] = None):
+        """Cache a result; ignored if the cache was invalidated since `generation`"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_size, len(embedding)), dtype=np.float32)
+            
+            if len(self._lru) >= self.max_size:
+                self._evict(next(iter(self._lru)))
+            slot = int(np.flatnonzero(~self._valid)[0])
+            
+            self._vectors[slot] = self._unit(embedding)
+            self._top_k[slot] = top_k
+            self._expires[slot] = time.monotonic() + self.ttl
+            self._valid[slot] = True
+            self._results[slot] = result
+            self._lru[slot] = None
+    
+    def _evict(self, slot: int):
+        self._valid[slot] = False
+        self._results[slot] = None
+        self._lru.pop(slot, None)
+    
+    def clear(self):
+        """Drop all cached answers"""
+        with self._lock:
+            self._valid[:] = False
+            self._results = [None] * self.max_size
+            self._lru.clear()
+            self.generation += 1
+    
+    def stats(self) -> Dict:
+        return {
+            "size": len(self._lru),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "generation": self.generation
+        }
@@ -1,10 +1,17 @@
 from sentence_transformers import SentenceTransformer
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
+import asyncio
 
 class EmbeddingGenerator:
-    def __init__(self, model_name: str):
+    def __init__(self, model_name: str, max_workers: int = 4):
         self.model = SentenceTransformer(model_name)
         self.dimension = self.model.get_sentence_embedding_dimension()
+        # Bounded pool so encode() calls never run on the event loop thread
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="embedding"
+        )
     
     def generate(self, texts: List[str]) -> List[List[float]]:
         """Generate embeddings for a list of texts"""
@@ -15,3 +22,17 @@ class EmbeddingGenerator:
         """Generate embedding for a single text"""
         embedding = self.model.encode([text], convert_to_numpy=True)
         return embedding[0].tolist()
+    
+    async def agenerate(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for a list of texts off the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.generate, texts)
+    
+    async def agenerate_single(self, text: str) -> List[float]:
+        """Generate embedding for a single text off the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.generate_single, text)
+    
+    def close(self):
+        """Shut down the embedding executor"""
+        self._executor.shutdown(wait=False)
@@ -1,15 +1,34 @@
 import requests
+import httpx
 import json
-from typing import Dict
+from typing import AsyncIterator, Dict, Optional
 
 class OllamaLLM:
-    def __init__(self, base_url: str, model: str):
+    def __init__(self, base_url: str, model: str, timeout: float = 60.0,
+                 max_connections: int = 20):
         self.base_url = base_url.rstrip('/')
         self.model = model
-        
-    def generate(self, question: str, context: str) -> str:
-        """Generate answer using RAG context"""
-        prompt = f"""You are a helpful AI assistant. Use the following context to answer the question accurately and concisely.
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._async_client: Optional[httpx.AsyncClient] = None
+    
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """Pooled async HTTP client, created on first use"""
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
+            )
+        return self._async_client
+    
+    def _build_prompt(self, question: str, context: str) -> str:
+        """Build the RAG prompt sent to Ollama"""
+        return f"""You are a helpful AI assistant. Use the following context to answer the question accurately and concisely.
 
 Context:
 {context}
@@ -23,21 +42,29 @@ Instructions:
 - Cite specific parts of the context when relevant
 
 Answer:"""
+    
+    def _build_payload(self, prompt: str, stream: bool = False) -> Dict:
+        """Build the /api/generate request body"""
+        return {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": stream,
+            "options": {
+                "temperature": 0.2,
+                "top_p": 0.9,
+                "top_k": 40
+            }
+        }
+        
+    def generate(self, question: str, context: str) -> str:
+        """Generate answer using RAG context"""
+        prompt = self._build_prompt(question, context)
         
         try:
             response = requests.post(
                 f"{self.base_url}/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.2,
-                        "top_p": 0.9,
-                        "top_k": 40
-                    }
-                },
-                timeout=60
+                json=self._build_payload(prompt),
+                timeout=self.timeout
             )
             
             if response.status_code == 200:
@@ -50,3 +77,58 @@ Answer:"""
             return f"Error connecting to Ollama: {str(e)}"
         except Exception as e:
             return f"Unexpected error: {str(e)}"
+    
+    async def agenerate(self, question: str, context: str) -> str:
+        """Generate answer using RAG context without blocking the event loop"""
+        prompt = self._build_prompt(question, context)
+        
+        try:
+            response = await self.async_client.post(
+                "/api/generate",
+                json=self._build_payload(prompt)
+            )
+            
+            if response.status_code == 200:
+                result = response.json()
+                return result.get("response", "Error generating response")
+            else:
+                return f"Error: Ollama returned status {response.status_code}"
+                
+        except httpx.HTTPError as e:
+            return f"Error connecting to Ollama: {str(e)}"
+        except Exception as e:
+            return f"Unexpected error: {str(e)}"
+    
+    async def astream(self, question: str, context: str) -> AsyncIterator[str]:
+        """Stream answer tokens from Ollama as they are generated"""
+        prompt = self._build_prompt(question, context)
+        
+        try:
+            # Leaving this block (e.g. client disconnect) closes the upstream
+            # connection, which makes Ollama stop generating
+            async with self.async_client.stream(
+                "POST",
+                "/api/generate",
+                json=self._build_payload(prompt, stream=True)
+            ) as response:
+                if response.status_code != 200:
+                    yield f"Error: Ollama returned status {response.status_code}"
+                    return
+                
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("response"):
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        break
+                        
+        except httpx.HTTPError as e:
+            yield f"Error connecting to Ollama: {str(e)}"
+    
+    async def aclose(self):
+        """Close the pooled async HTTP client"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
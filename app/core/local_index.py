@@ -0,0 +1,410 @@
+from app.core.vector_store import VectorBackend, RetrievedChunk
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+import json
+import os
+import shutil
+import threading
+import numpy as np
+
+class LocalVectorIndex(VectorBackend):
+    """In-process vector index with no network round-trip
+    
+    Unit-normalized vectors live in a memory-mapped float32/float16 matrix
+    (vectors.bin); IDs and payloads live in an append-only JSONL sidecar
+    (payloads.jsonl) that is replayed on startup. Search is a blocked NumPy
+    matrix-vector product plus top-k selection. With ivf_lists > 0, rows are
+    partitioned by spherical k-means and only the ivf_nprobe closest lists are
+    scanned once the index is large enough to train.
+    """
+    
+    def __init__(self, path: Optional[str], vector_size: int, dtype: str = "float32",
+                 ivf_lists: int = 0, ivf_nprobe: int = 8, initial_capacity: int = 1024,
+                 block_rows: int = 65536):
+        # No path (or ":memory:") keeps everything in RAM, e.g. for tests
+        self.path = Path(path) if path and path != ":memory:" else None
+        self.vector_size = vector_size
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float32, np.float16):
+            raise ValueError(f"Unsupported local index dtype: {dtype}")
+        self.ivf_lists = ivf_lists
+        self.ivf_nprobe = ivf_nprobe
+        self.initial_capacity = initial_capacity
+        self.block_rows = block_rows
+        self._lock = threading.RLock()
+        self._open()
+    
+    # Storage
+    
+    def _open(self):
+        self._size = 0
+        self._ids: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._payloads: List[Optional[Dict]] = []
+        self._by_source: Dict[str, Set[str]] = {}
+        self._log_ops = 0
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[array] = []
+        self._trained_size = 0
+        
+        capacity = self.initial_capacity
+        if self.path:
+            self.path.mkdir(parents=True, exist_ok=True)
+            meta_path = self.path / "meta.json"
+            if meta_path.exists():
+                meta = json.loads(meta_path.read_text())
+                if meta["dim"] != self.vector_size or meta["dtype"] != self.dtype.name:
+                    raise ValueError(
+                        f"Local index at {self.path} holds {meta['dim']}-d {meta['dtype']} "
+                        f"vectors; expected {self.vector_size}-d {self.dtype.name}"
+                    )
+                capacity = meta["capacity"]
+        self._allocate(capacity)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._assign = np.full(capacity, -1, dtype=np.int32)
+        
+        if self.path:
+            self._replay()
+            centroids_path = self.path / "ivf_centroids.npy"
+            if centroids_path.exists():
+                self._set_centroids(np.load(centroids_path))
+    
+    def _allocate(self, capacity: int):
+        shape = (capacity, self.vector_size)
+        if not self.path:
+            self._vectors = np.zeros(shape, dtype=self.dtype)
+            return
+        vectors_path = self.path / "vectors.bin"
+        nbytes = capacity * self.vector_size * self.dtype.itemsize
+        with open(vectors_path, "ab") as file:
+            if file.tell() < nbytes:
+                file.truncate(nbytes)
+        self._vectors = np.memmap(vectors_path, dtype=self.dtype, mode="r+", shape=shape)
+        (self.path / "meta.json").write_text(json.dumps({
+            "dim": self.vector_size,
+            "dtype": self.dtype.name,
+            "capacity": capacity
+        }))
+    
+    def _grow(self, needed: int):
+        capacity = len(self._alive)
+        if needed <= capacity:
+            return
+        new_capacity = max(capacity * 2, needed)
+        if self.path:
+            self._vectors.flush()
+            del self._vectors
+            self._allocate(new_capacity)
+        else:
+            vectors = np.zeros((new_capacity, self.vector_size), dtype=self.dtype)
+            vectors[:capacity] = self._vectors
+            self._vectors = vectors
+        self._alive = np.concatenate([self._alive, np.zeros(new_capacity - capacity, dtype=bool)])
+        self._assign = np.concatenate(
+            [self._assign, np.full(new_capacity - capacity, -1, dtype=np.int32)]
+        )
+    
+    def _log(self, entries: List[Dict]):
+        if not self.path or not entries:
+            return
+        with open(self.path / "payloads.jsonl", "a", encoding="utf-8") as log:
+            for entry in entries:
+                log.write(json.dumps(entry) + "\n")
+        self._log_ops += len(entries)
+        # Rewrite the sidecar once it is mostly superseded entries
+        if self._log_ops > 2 * len(self._rows) + 10000:
+            self._compact_log()
+    
+    def _replay(self):
+        log_path = self.path / "payloads.jsonl"
+        if not log_path.exists():
+            return
+        with open(log_path, encoding="utf-8") as log:
+            for line in log:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-write
+                    continue
+                self._apply(entry)
+                self._log_ops += 1
+    
+    def _apply(self, entry: Dict):
+        op = entry["op"]
+        if op == "upsert":
+            self._place(entry["id"], entry["row"], entry["payload"])
+        elif op == "delete":
+            for point_id in entry["ids"]:
+                self._drop(point_id)
+        elif op == "set":
+            self._merge_payload(entry["id"], entry["payload"])
+        elif op == "set_source":
+            for point_id in list(self._by_source.get(entry["source"], ())):
+                self._merge_payload(point_id, entry["payload"])
+    
+    def _compact_log(self):
+        tmp = self.path / "payloads.jsonl.tmp"
+        with open(tmp, "w", encoding="utf-8") as log:
+            for point_id, row in self._rows.items():
+                log.write(json.dumps({
+                    "op": "upsert", "id": point_id, "row": row, "payload": self._payloads[row]
+                }) + "\n")
+        os.replace(tmp, self.path / "payloads.jsonl")
+        self._log_ops = len(self._rows)
+    
+    def flush(self):
+        """Persist vectors and compact the payload sidecar"""
+        with self._lock:
+            if self.path:
+                self._vectors.flush()
+                self._compact_log()
+    
+    # Row bookkeeping
+    
+    def _place(self, point_id: str, row: int, payload: Dict):
+        self._grow(row + 1)
+        while len(self._ids) <= row:
+            self._ids.append(None)
+            self._payloads.append(None)
+        old_row = self._rows.get(point_id)
+        if old_row is not None and old_row != row:
+            self._alive[old_row] = False
+            self._ids[old_row] = None
+            self._payloads[old_row] = None
+        old_payload = self._payloads[row]
+        if old_payload is not None:
+            self._by_source.get(old_payload.get("source"), set()).discard(point_id)
+        
+        self._ids[row] = point_id
+        self._rows[point_id] = row
+        self._payloads[row] = payload
+        self._alive[row] = True
+        self._by_source.setdefault(payload.get("source"), set()).add(point_id)
+        self._size = max(self._size, row + 1)
+    
+    def _drop(self, point_id: str):
+        row = self._rows.pop(point_id, None)
+        if row is None:
+            return
+        payload = self._payloads[row] or {}
+        self._by_source.get(payload.get("source"), set()).discard(point_id)
+        self._alive[row] = False
+        self._ids[row] = None
+        self._payloads[row] = None
+    
+    def _merge_payload(self, point_id: str, payload: Dict):
+        row = self._rows.get(point_id)
+        if row is not None:
+            self._payloads[row] = {**self._payloads[row], **payload}
+    
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+    
+    # IVF partitioning
+    
+    def _set_centroids(self, centroids: np.ndarray):
+        self._centroids = centroids.astype(np.float32)
+        self._lists = [array("i") for _ in range(len(centroids))]
+        self._assign[:] = -1
+        rows = np.flatnonzero(self._alive[:self._size])
+        self._assign_rows(rows)
+        self._trained_size = len(rows)
+    
+    def _assign_rows(self, rows: np.ndarray):
+        for start in range(0, len(rows), self.block_rows):
+            block = rows[start:start + self.block_rows]
+            vectors = self._vectors[block].astype(np.float32)
+            nearest = np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+            self._assign[block] = nearest
+            for list_id in np.unique(nearest):
+                self._lists[list_id].extend(block[nearest == list_id].tolist())
+    
+    def train_ivf(self, iterations: int = 10, sample_per_list: int = 256, seed: int = 0):
+        """Partition rows with spherical k-means into ivf_lists lists"""
+        with self._lock:
+            rows = np.flatnonzero(self._alive[:self._size])
+            if self.ivf_lists <= 0 or len(rows) < self.ivf_lists:
+                return
+            rng = np.random.default_rng(seed)
+            sample_rows = rng.choice(
+                rows, size=min(len(rows), self.ivf_lists * sample_per_list), replace=False
+            )
+            sample = self._vectors[np.sort(sample_rows)].astype(np.float32)
+            centroids = sample[rng.choice(len(sample), size=self.ivf_lists, replace=False)]
+            
+            for _ in range(iterations):
+                nearest = np.argmax(sample @ centroids.T, axis=1)
+                for list_id in range(self.ivf_lists):
+                    members = sample[nearest == list_id]
+                    if len(members):
+                        centroids[list_id] = members.sum(axis=0)
+                centroids = self._normalize(centroids)
+            
+            self._set_centroids(centroids)
+            if self.path:
+                np.save(self.path / "ivf_centroids.npy", self._centroids)
+    
+    def _maybe_train(self):
+        # Train once there are ~39 points per list, retrain after the index doubles
+        alive = len(self._rows)
+        if self.ivf_lists <= 0 or alive < self.ivf_lists * 39:
+            return
+        if self._centroids is None or alive >= 2 * self._trained_size:
+            self.train_ivf()
+    
+    def _candidate_rows(self, query: np.ndarray) -> Optional[np.ndarray]:
+        """Rows in the nprobe closest IVF lists, or None to scan everything"""
+        if self._centroids is None:
+            return None
+        probes = np.argsort(self._centroids @ query)[-self.ivf_nprobe:]
+        rows = np.concatenate([
+            np.frombuffer(self._lists[list_id], dtype=np.int32) for list_id in probes
+        ]) if len(probes) else np.zeros(0, dtype=np.int32)
+        # Lists are append-only; skip rows that were deleted or moved to another list
+        rows = np.unique(rows)
+        keep = self._alive[rows] & np.isin(self._assign[rows], probes)
+        return rows[keep]
+    
+    # VectorBackend
+    
+    def ensure_collection(self):
+        pass
+    
+    def reset(self):
+        with self._lock:
+            if self.path:
+                del self._vectors
+                shutil.rmtree(self.path, ignore_errors=True)
+            self._open()
+    
+    def upsert(self, ids: List[str], vectors: List[List[float]], payloads: List[Dict]):
+        if not ids:
+            return
+        normalized = self._normalize(vectors)
+        with self._lock:
+            rows = []
+            entries = []
+            next_row = self._size
+            for point_id, payload in zip(ids, payloads):
+                row = self._rows.get(point_id)
+                if row is None:
+                    row = next_row
+                    next_row += 1
+                self._place(point_id, row, payload)
+                rows.append(row)
+                entries.append({"op": "upsert", "id": point_id, "row": row, "payload": payload})
+            
+            rows = np.asarray(rows, dtype=np.int64)
+            self._vectors[rows] = normalized.astype(self.dtype)
+            if self._centroids is not None:
+                self._assign_rows(rows)
+            if self.path:
+                self._vectors.flush()
+            self._log(entries)
+            self._maybe_train()
+    
+    def _vector(self, row: int) -> List[float]:
+        return self._vectors[row].astype(np.float32).tolist()
+    
+    def search(self, query_embedding: List[float], limit: int,
+               score_threshold: Optional[float],
+               with_vectors: bool = False) -> List[RetrievedChunk]:
+        query = self._normalize(query_embedding)[0]
+        with self._lock:
+            if not self._rows:
+                return []
+            
+            candidates = self._candidate_rows(query)
+            if candidates is not None:
+                rows = candidates
+                scores = self._vectors[rows].astype(np.float32) @ query
+            else:
+                rows = np.arange(self._size)
+                scores = np.empty(self._size, dtype=np.float32)
+                for start in range(0, self._size, self.block_rows):
+                    end = min(start + self.block_rows, self._size)
+                    block = self._vectors[start:end]
+                    scores[start:end] = block.astype(np.float32, copy=False) @ query
+                scores[~self._alive[:self._size]] = -np.inf
+            
+            if score_threshold is not None:
+                keep = scores >= score_threshold
+                rows, scores = rows[keep], scores[keep]
+            else:
+                keep = np.isfinite(scores)
+                rows, scores = rows[keep], scores[keep]
+            
+            if len(scores) > limit:
+                top = np.argpartition(-scores, limit)[:limit]
+            else:
+                top = np.arange(len(scores))
+            top = top[np.argsort(-scores[top])]
+            
+            return [
+                RetrievedChunk(
+                    id=self._ids[rows[i]],
+                    score=float(scores[i]),
+                    payload=dict(self._payloads[rows[i]]),
+                    vector=self._vector(rows[i]) if with_vectors else None
+                )
+                for i in top
+            ]
+    
+    def retrieve(self, ids: List[str], with_vectors: bool = False) -> List[RetrievedChunk]:
+        with self._lock:
+            return [
+                RetrievedChunk(
+                    id=point_id,
+                    score=0.0,
+                    payload=dict(self._payloads[row]),
+                    vector=self._vector(row) if with_vectors else None
+                )
+                for point_id in ids
+                if (row := self._rows.get(point_id)) is not None
+            ]
+    
+    def get_source_points(self, source: str) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                point_id: dict(self._payloads[self._rows[point_id]])
+                for point_id in self._by_source.get(source, ())
+            }
+    
+    def delete(self, ids: List[str]):
+        with self._lock:
+            for point_id in ids:
+                self._drop(point_id)
+            self._log([{"op": "delete", "ids": list(ids)}])
+    
+    def set_source_payload(self, source: str, payload: Dict):
+        with self._lock:
+            self._apply({"op": "set_source", "source": source, "payload": payload})
+            self._log([{"op": "set_source", "source": source, "payload": payload}])
+    
+    def update_payloads(self, payloads: Dict[str, Dict]):
+        with self._lock:
+            entries = [
+                {"op": "set", "id": point_id, "payload": payload}
+                for point_id, payload in payloads.items()
+            ]
+            for entry in entries:
+                self._apply(entry)
+            self._log(entries)
+    
+    def count(self) -> int:
+        return len(self._rows)
+    
+    def iter_texts(self, batch_size: int) -> Iterator[Tuple[str, str]]:
+        with self._lock:
+            items = [
+                (point_id, self._payloads[row].get("text", ""))
+                for point_id, row in self._rows.items()
+            ]
+        return iter(items)
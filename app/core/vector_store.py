@@ -1,66 +1,493 @@
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-from typing import List, Dict
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, PointIdsList, Filter, FieldCondition,
+    MatchValue, SetPayload, SetPayloadOperation, HnswConfigDiff, ScalarQuantization,
+    ScalarQuantizationConfig, ScalarType, BinaryQuantization, BinaryQuantizationConfig,
+    SearchParams, QuantizationSearchParams
+)
+from dataclasses import dataclass, field
+from typing import Iterator, List, Dict, Optional, Tuple
+import asyncio
+import hashlib
 import uuid
 
-class VectorStore:
-    def __init__(self, host: str, port: int, collection_name: str, vector_size: int):
-        self.client = QdrantClient(host=host, port=port)
+# Namespace for deterministic point IDs (uuid5 of source + content hash)
+POINT_ID_NAMESPACE = uuid.UUID("6f1c3e0a-5b7d-4a52-9c1e-2d8f4b6a7e90")
+
+# Payload fields needed to reconcile a source on re-ingest
+SOURCE_POINT_FIELDS = ["chunk_index", "total_chunks", "content_hash"]
+
+def content_hash(text: str) -> str:
+    """Stable hash of a chunk's text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def chunk_point_id(source: str, text: str) -> str:
+    """Deterministic point ID so re-ingesting the same chunk overwrites it"""
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{source}:{content_hash(text)}"))
+
+@dataclass
+class RetrievedChunk:
+    """A search hit; same shape as Qdrant's ScoredPoint for the fields we use"""
+    id: str
+    score: float
+    payload: Dict = field(default_factory=dict)
+    vector: Optional[List[float]] = None
+
+class VectorBackend:
+    """Storage and search behind VectorStore
+    
+    Vectors are compared by cosine similarity. Async methods default to running
+    the sync method in a worker thread; networked backends override them.
+    """
+    
+    def ensure_collection(self):
+        """Create the underlying collection/index if it doesn't exist"""
+        raise NotImplementedError
+    
+    def reset(self):
+        """Delete every point and recreate an empty collection"""
+        raise NotImplementedError
+    
+    def upsert(self, ids: List[str], vectors: List[List[float]], payloads: List[Dict]):
+        raise NotImplementedError
+    
+    def search(self, query_embedding: List[float], limit: int,
+               score_threshold: Optional[float], with_vectors: bool = False) -> List:
+        raise NotImplementedError
+    
+    def retrieve(self, ids: List[str], with_vectors: bool = False) -> List:
+        raise NotImplementedError
+    
+    def get_source_points(self, source: str) -> Dict[str, Dict]:
+        raise NotImplementedError
+    
+    def delete(self, ids: List[str]):
+        raise NotImplementedError
+    
+    def set_source_payload(self, source: str, payload: Dict):
+        raise NotImplementedError
+    
+    def update_payloads(self, payloads: Dict[str, Dict]):
+        raise NotImplementedError
+    
+    def count(self) -> int:
+        raise NotImplementedError
+    
+    def iter_texts(self, batch_size: int) -> Iterator[Tuple[str, str]]:
+        raise NotImplementedError
+    
+    async def asearch(self, query_embedding: List[float], limit: int,
+                      score_threshold: Optional[float], with_vectors: bool = False) -> List:
+        return await asyncio.to_thread(
+            self.search, query_embedding, limit, score_threshold, with_vectors
+        )
+    
+    async def aretrieve(self, ids: List[str], with_vectors: bool = False) -> List:
+        return await asyncio.to_thread(self.retrieve, ids, with_vectors)
+    
+    async def aclose(self):
+        pass
+
+class QdrantBackend(VectorBackend):
+    """Networked (or in-process ":memory:") Qdrant collection
+    
+    quantization is "none", "scalar" (int8) or "binary". With on_disk=True the
+    original float32 vectors are memory-mapped from disk while the quantized
+    copy stays in RAM; searches oversample on the quantized vectors and rescore
+    the candidates with the originals.
+    """
+    
+    def __init__(self, host: str, port: int, collection_name: str, vector_size: int,
+                 location: Optional[str] = None, quantization: str = "none",
+                 on_disk: bool = False, hnsw_m: int = 16, hnsw_ef_construct: int = 100,
+                 hnsw_ef: Optional[int] = None, oversampling: float = 2.0,
+                 rescore: bool = True):
+        if quantization not in ("none", "scalar", "binary"):
+            raise ValueError(f"Unknown quantization: {quantization}")
+        self.location = location
+        self.quantization = quantization
+        self.on_disk = on_disk
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construct = hnsw_ef_construct
+        self.hnsw_ef = hnsw_ef
+        self.oversampling = oversampling
+        self.rescore = rescore
+        if location:
+            # In-process Qdrant (e.g. ":memory:") for tests; sync and async clients
+            # don't share storage in this mode
+            self.client = QdrantClient(location=location)
+            self.async_client = AsyncQdrantClient(location=location)
+        else:
+            self.client = QdrantClient(host=host, port=port)
+            self.async_client = AsyncQdrantClient(host=host, port=port)
         self.collection_name = collection_name
         self.vector_size = vector_size
-        self._ensure_collection()
     
-    def _ensure_collection(self):
+    @classmethod
+    def from_settings(cls, settings, vector_size: int) -> "QdrantBackend":
+        return cls(
+            settings.qdrant_host,
+            settings.qdrant_port,
+            settings.qdrant_collection_name,
+            vector_size,
+            quantization=settings.qdrant_quantization,
+            on_disk=settings.qdrant_on_disk,
+            hnsw_m=settings.qdrant_hnsw_m,
+            hnsw_ef_construct=settings.qdrant_hnsw_ef_construct,
+            hnsw_ef=settings.qdrant_hnsw_ef,
+            oversampling=settings.qdrant_oversampling,
+            rescore=settings.qdrant_rescore
+        )
+    
+    def _quantization_config(self):
+        if self.quantization == "scalar":
+            return ScalarQuantization(scalar=ScalarQuantizationConfig(
+                type=ScalarType.INT8, quantile=0.99, always_ram=True
+            ))
+        if self.quantization == "binary":
+            return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+        return None
+    
+    def _create_collection(self, collection_name: str):
+        self.client.create_collection(
+            collection_name=collection_name,
+            vectors_config=VectorParams(
+                size=self.vector_size,
+                distance=Distance.COSINE,
+                on_disk=self.on_disk
+            ),
+            hnsw_config=HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct),
+            quantization_config=self._quantization_config()
+        )
+    
+    def _search_params(self) -> Optional[SearchParams]:
+        quantization = None
+        if self.quantization != "none":
+            quantization = QuantizationSearchParams(
+                rescore=self.rescore, oversampling=self.oversampling
+            )
+        if quantization is None and self.hnsw_ef is None:
+            return None
+        return SearchParams(hnsw_ef=self.hnsw_ef, quantization=quantization)
+    
+    def _collection_exists(self, collection_name: str) -> bool:
+        collections = self.client.get_collections().collections
+        return collection_name in [col.name for col in collections]
+    
+    def ensure_collection(self):
         """Create collection if it doesn't exist"""
         try:
-            collections = self.client.get_collections().collections
-            collection_names = [col.name for col in collections]
-            
-            if self.collection_name not in collection_names:
-                self.client.create_collection(
-                    collection_name=self.collection_name,
-                    vectors_config=VectorParams(
-                        size=self.vector_size,
-                        distance=Distance.COSINE
-                    )
+            if not self._collection_exists(self.collection_name):
+                self._create_collection(self.collection_name)
+            elif not self.config_matches():
+                print(
+                    f"Warning: Qdrant collection '{self.collection_name}' was created with "
+                    f"different vector settings; run scripts/setup_qdrant.py --migrate"
                 )
         except Exception as e:
             print(f"Warning: Could not connect to Qdrant: {e}")
     
-    def add_documents(self, texts: List[str], embeddings: List[List[float]], 
-                     metadata: List[Dict] = None):
-        """Add documents to vector store"""
-        points = []
-        for idx, (text, embedding) in enumerate(zip(texts, embeddings)):
-            point_id = str(uuid.uuid4())
-            payload = {"text": text}
-            if metadata and idx < len(metadata):
-                payload.update(metadata[idx])
-            
-            points.append(
-                PointStruct(
-                    id=point_id,
-                    vector=embedding,
-                    payload=payload
-                )
+    def config_matches(self) -> bool:
+        """Whether the existing collection uses the configured storage settings"""
+        if self.location:
+            # In-process Qdrant ignores HNSW and quantization settings
+            return True
+        config = self.client.get_collection(self.collection_name).config
+        quantization = config.quantization_config
+        kind = (
+            "scalar" if isinstance(quantization, ScalarQuantization)
+            else "binary" if isinstance(quantization, BinaryQuantization)
+            else "none"
+        )
+        return (
+            bool(config.params.vectors.on_disk) == self.on_disk
+            and config.hnsw_config.m == self.hnsw_m
+            and config.hnsw_config.ef_construct == self.hnsw_ef_construct
+            and kind == self.quantization
+        )
+    
+    def _copy_points(self, source: str, target: str, batch_size: int):
+        offset = None
+        while True:
+            records, offset = self.client.scroll(
+                collection_name=source,
+                with_payload=True,
+                with_vectors=True,
+                limit=batch_size,
+                offset=offset
             )
+            if records:
+                self.client.upsert(
+                    collection_name=target,
+                    points=[
+                        PointStruct(id=record.id, vector=record.vector, payload=record.payload)
+                        for record in records
+                    ]
+                )
+            if offset is None:
+                return
+    
+    def _staging_collection(self) -> str:
+        return f"{self.collection_name}__migrate"
+    
+    def migration_pending(self) -> bool:
+        """Whether an interrupted recreate() left a staging collection behind"""
+        return self._collection_exists(self._staging_collection())
+    
+    def recreate(self, batch_size: int = 256) -> int:
+        """Re-create the collection under the configured settings, keeping its points
+        
+        Points are copied to a staging collection first, so a run interrupted after
+        the original was dropped resumes from the staging copy.
+        """
+        staging = self._staging_collection()
+        if not self._collection_exists(staging):
+            self._create_collection(staging)
+            if self._collection_exists(self.collection_name):
+                self._copy_points(self.collection_name, staging, batch_size)
         
+        if self._collection_exists(self.collection_name):
+            self.client.delete_collection(self.collection_name)
+        self._create_collection(self.collection_name)
+        self._copy_points(staging, self.collection_name, batch_size)
+        self.client.delete_collection(staging)
+        return self.count()
+    
+    def reset(self):
+        self.client.delete_collection(self.collection_name)
+        self.ensure_collection()
+    
+    def upsert(self, ids: List[str], vectors: List[List[float]], payloads: List[Dict]):
         self.client.upsert(
             collection_name=self.collection_name,
-            points=points
+            points=[
+                PointStruct(id=point_id, vector=vector, payload=payload)
+                for point_id, vector, payload in zip(ids, vectors, payloads)
+            ]
+        )
+    
+    def _source_filter(self, source: str) -> Filter:
+        return Filter(must=[FieldCondition(key="source", match=MatchValue(value=source))])
+    
+    def get_source_points(self, source: str) -> Dict[str, Dict]:
+        points = {}
+        offset = None
+        while True:
+            records, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=self._source_filter(source),
+                with_payload=SOURCE_POINT_FIELDS,
+                with_vectors=False,
+                limit=1000,
+                offset=offset
+            )
+            for record in records:
+                points[str(record.id)] = record.payload or {}
+            if offset is None:
+                return points
+    
+    def delete(self, ids: List[str]):
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=PointIdsList(points=ids)
+        )
+    
+    def retrieve(self, ids: List[str], with_vectors: bool = False) -> List:
+        return self.client.retrieve(
+            collection_name=self.collection_name,
+            ids=ids,
+            with_payload=True,
+            with_vectors=with_vectors
+        )
+    
+    async def aretrieve(self, ids: List[str], with_vectors: bool = False) -> List:
+        return await self.async_client.retrieve(
+            collection_name=self.collection_name,
+            ids=ids,
+            with_payload=True,
+            with_vectors=with_vectors
+        )
+    
+    def count(self) -> int:
+        return self.client.count(collection_name=self.collection_name, exact=True).count
+    
+    def iter_texts(self, batch_size: int) -> Iterator[Tuple[str, str]]:
+        offset = None
+        while True:
+            records, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                with_payload=["text"],
+                with_vectors=False,
+                limit=batch_size,
+                offset=offset
+            )
+            for record in records:
+                yield str(record.id), (record.payload or {}).get("text", "")
+            if offset is None:
+                return
+    
+    def set_source_payload(self, source: str, payload: Dict):
+        self.client.set_payload(
+            collection_name=self.collection_name,
+            payload=payload,
+            points=self._source_filter(source)
+        )
+    
+    def update_payloads(self, payloads: Dict[str, Dict]):
+        self.client.batch_update_points(
+            collection_name=self.collection_name,
+            update_operations=[
+                SetPayloadOperation(set_payload=SetPayload(payload=payload, points=[point_id]))
+                for point_id, payload in payloads.items()
+            ]
         )
     
-    def search(self, query_embedding: List[float], limit: int = 5, 
-              score_threshold: float = 0.7):
+    def search(self, query_embedding: List[float], limit: int,
+               score_threshold: Optional[float], with_vectors: bool = False) -> List:
+        return self.client.search(
+            collection_name=self.collection_name,
+            query_vector=query_embedding,
+            limit=limit,
+            score_threshold=score_threshold,
+            search_params=self._search_params(),
+            with_vectors=with_vectors
+        )
+    
+    async def asearch(self, query_embedding: List[float], limit: int,
+                      score_threshold: Optional[float], with_vectors: bool = False) -> List:
+        return await self.async_client.search(
+            collection_name=self.collection_name,
+            query_vector=query_embedding,
+            limit=limit,
+            score_threshold=score_threshold,
+            search_params=self._search_params(),
+            with_vectors=with_vectors
+        )
+    
+    async def aclose(self):
+        await self.async_client.close()
+
+class VectorStore:
+    def __init__(self, host: str, port: int, collection_name: str, vector_size: int,
+                 location: Optional[str] = None, backend: Optional[VectorBackend] = None):
+        self.backend = backend or QdrantBackend(
+            host, port, collection_name, vector_size, location=location
+        )
+        self.collection_name = collection_name
+        self.vector_size = vector_size
+        self._ensure_collection()
+    
+    @classmethod
+    def from_settings(cls, settings, vector_size: int) -> "VectorStore":
+        """Build the vector store with the backend selected in Settings"""
+        if settings.vector_backend == "qdrant":
+            backend = QdrantBackend.from_settings(settings, vector_size)
+        elif settings.vector_backend == "local":
+            from app.core.local_index import LocalVectorIndex
+            backend = LocalVectorIndex(
+                settings.local_index_path,
+                vector_size,
+                dtype=settings.local_index_dtype,
+                ivf_lists=settings.local_index_ivf_lists,
+                ivf_nprobe=settings.local_index_ivf_nprobe
+            )
+        else:
+            raise ValueError(f"Unknown vector backend: {settings.vector_backend}")
+        
+        return cls(
+            host=settings.qdrant_host,
+            port=settings.qdrant_port,
+            collection_name=settings.qdrant_collection_name,
+            vector_size=vector_size,
+            backend=backend
+        )
+    
+    @property
+    def client(self) -> QdrantClient:
+        """Underlying Qdrant client (Qdrant backend only)"""
+        return self.backend.client
+    
+    def _ensure_collection(self):
+        """Create collection if it doesn't exist"""
+        self.backend.ensure_collection()
+    
+    def reset(self):
+        """Delete all documents"""
+        self.backend.reset()
+    
+    def add_documents(self, texts: List[str], embeddings: List[List[float]],
+                     metadata: List[Dict] = None, ids: Optional[List[str]] = None):
+        """Add documents to vector store"""
+        point_ids = []
+        payloads = []
+        for idx, text in enumerate(texts):
+            payload = {"text": text, "content_hash": content_hash(text)}
+            if metadata and idx < len(metadata):
+                payload.update(metadata[idx])
+            if ids:
+                point_ids.append(ids[idx])
+            else:
+                point_ids.append(chunk_point_id(payload.get("source", ""), text))
+            payloads.append(payload)
+        
+        self.backend.upsert(point_ids, embeddings, payloads)
+    
+    def get_source_points(self, source: str) -> Dict[str, Dict]:
+        """Return {point_id: payload} for every chunk stored for a source"""
+        return self.backend.get_source_points(source)
+    
+    def delete_points(self, ids: List[str]):
+        """Delete points by ID"""
+        if not ids:
+            return
+        self.backend.delete(ids)
+    
+    def retrieve(self, ids: List[str], with_vectors: bool = False):
+        """Fetch points (with payload) by ID"""
+        return self.backend.retrieve(ids, with_vectors)
+    
+    async def aretrieve(self, ids: List[str], with_vectors: bool = False):
+        """Fetch points (with payload) by ID without blocking the event loop"""
+        return await self.backend.aretrieve(ids, with_vectors)
+    
+    def count(self) -> int:
+        """Number of points in the collection"""
+        return self.backend.count()
+    
+    def iter_texts(self, batch_size: int = 1000) -> Iterator[Tuple[str, str]]:
+        """Yield (point_id, text) for every point in the collection"""
+        return self.backend.iter_texts(batch_size)
+    
+    def set_source_payload(self, source: str, payload: Dict):
+        """Set payload fields on every chunk of a source"""
+        self.backend.set_source_payload(source, payload)
+    
+    def update_payloads(self, payloads: Dict[str, Dict]):
+        """Overwrite payload fields for many points in one request"""
+        if not payloads:
+            return
+        self.backend.update_payloads(payloads)
+    
+    def search(self, query_embedding: List[float], limit: int = 5,
+              score_threshold: float = 0.7, with_vectors: bool = False):
         """Search for similar documents"""
         try:
-            results = self.client.search(
-                collection_name=self.collection_name,
-                query_vector=query_embedding,
-                limit=limit,
-                score_threshold=score_threshold
+            return self.backend.search(query_embedding, limit, score_threshold, with_vectors)
+        except Exception as e:
+            print(f"Search error: {e}")
+            return []
+    
+    async def asearch(self, query_embedding: List[float], limit: int = 5,
+                      score_threshold: float = 0.7, with_vectors: bool = False):
+        """Search for similar documents without blocking the event loop"""
+        try:
+            return await self.backend.asearch(
+                query_embedding, limit, score_threshold, with_vectors
             )
-            return results
         except Exception as e:
             print(f"Search error: {e}")
             return []
+    
+    async def aclose(self):
+        """Release backend connections"""
+        await self.backend.aclose()
@@ -15,8 +15,14 @@ class QueryResponse(BaseModel):
     answer: str
     sources: List[SourceInfo]
     context_used: int
+    context_tokens: int = 0
+    context_tokens_saved: int = 0
+    cached: bool = False
 
 class IngestResponse(BaseModel):
     status: str
     documents_ingested: int
+    chunks_added: int = 0
+    chunks_skipped: int = 0
+    chunks_deleted: int = 0
     message: Optional[str] = None
@@ -0,0 +1,173 @@
+from dataclasses import dataclass, field
+from typing import Dict, List
+import re
+import threading
+import numpy as np
+
+# Words and individual punctuation marks; tracks BPE token counts closely
+# enough for budgeting without loading the LLM's tokenizer
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+def count_tokens(text: str) -> int:
+    """Approximate LLM token count of a text"""
+    return len(TOKEN_PATTERN.findall(text))
+
+def join_overlapping(first: str, second: str, max_overlap: int = 200,
+                     min_overlap: int = 8) -> str:
+    """Join consecutive chunks, dropping the text the splitter repeated in both"""
+    for size in range(min(len(first), len(second), max_overlap), min_overlap - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return first + " " + second
+
+@dataclass
+class PackedContext:
+    text: str
+    sources: List[Dict] = field(default_factory=list)
+    chunks_used: int = 0
+    tokens: int = 0
+    tokens_saved: int = 0
+    duplicates_dropped: int = 0
+    chunks_merged: int = 0
+    over_budget_dropped: int = 0
+
+class ContextPacker:
+    """Assemble retrieved chunks into an LLM context under a token budget
+    
+    Chunks are taken in rank order. Near-duplicates (cosine similarity of their
+    stored embeddings >= duplicate_threshold) are dropped, consecutive chunks
+    of the same source are merged into one span without the repeated overlap,
+    and spans are added until max_tokens is reached.
+    """
+    
+    def __init__(self, max_tokens: int = 1500, duplicate_threshold: float = 0.95,
+                 max_overlap: int = 200):
+        self.max_tokens = max_tokens
+        self.duplicate_threshold = duplicate_threshold
+        self.max_overlap = max_overlap
+        self._lock = threading.Lock()
+        self.contexts = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+    
+    def _drop_duplicates(self, results: List) -> List:
+        with_vectors = [idx for idx, result in enumerate(results) if result.vector is not None]
+        if len(with_vectors) < 2:
+            return list(results)
+        
+        vectors = np.asarray([results[idx].vector for idx in with_vectors], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors /= norms
+        similarity = vectors @ vectors.T
+        
+        # Greedy in rank order: a chunk survives unless a kept one is too similar
+        dropped = set()
+        kept_rows: List[int] = []
+        for row, idx in enumerate(with_vectors):
+            if kept_rows and similarity[row, kept_rows].max() >= self.duplicate_threshold:
+                dropped.add(idx)
+            else:
+                kept_rows.append(row)
+        return [result for idx, result in enumerate(results) if idx not in dropped]
+    
+    def _spans(self, results: List) -> List[List]:
+        """Group chunks into runs of consecutive chunk_index per source, best rank first"""
+        by_key = {}
+        for result in results:
+            source = result.payload.get("source", "unknown")
+            by_key[(source, result.payload.get("chunk_index"))] = result
+        
+        spans = []
+        claimed = set()
+        for result in results:
+            source = result.payload.get("source", "unknown")
+            index = result.payload.get("chunk_index")
+            if (source, index) in claimed:
+                continue
+            if not isinstance(index, int):
+                claimed.add((source, index))
+                spans.append([result])
+                continue
+            # Extend in both directions over retrieved neighbours
+            start = index
+            while (source, start - 1) in by_key and (source, start - 1) not in claimed:
+                start -= 1
+            end = index
+            while (source, end + 1) in by_key and (source, end + 1) not in claimed:
+                end += 1
+            span = [by_key[(source, i)] for i in range(start, end + 1)]
+            claimed.update((source, i) for i in range(start, end + 1))
+            spans.append(span)
+        return spans
+    
+    def _span_text(self, span: List) -> str:
+        text = span[0].payload["text"]
+        for result in span[1:]:
+            text = join_overlapping(text, result.payload["text"], self.max_overlap)
+        return text
+    
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        matches = list(TOKEN_PATTERN.finditer(text))
+        if len(matches) <= max_tokens:
+            return text
+        return text[:matches[max_tokens - 1].end()] if max_tokens > 0 else ""
+    
+    def pack(self, results: List) -> PackedContext:
+        """Build the context for a list of ranked search results"""
+        results = list(results)
+        naive_tokens = count_tokens("\n\n".join(result.payload["text"] for result in results))
+        
+        deduped = self._drop_duplicates(results)
+        spans = self._spans(deduped)
+        
+        parts: List[str] = []
+        sources: List[Dict] = []
+        tokens = 0
+        over_budget = 0
+        for span in spans:
+            text = self._span_text(span)
+            span_tokens = count_tokens(text)
+            if tokens + span_tokens > self.max_tokens:
+                if parts:
+                    over_budget += len(span)
+                    continue
+                # Always keep (part of) the best span
+                text = self._truncate(text, self.max_tokens)
+                span_tokens = count_tokens(text)
+            parts.append(text)
+            tokens += span_tokens
+            for result in span:
+                sources.append({
+                    "source": result.payload.get("source", "unknown"),
+                    "score": result.score,
+                    "chunk_index": result.payload.get("chunk_index", 0)
+                })
+        
+        text = "\n\n".join(parts)
+        packed = PackedContext(
+            text=text,
+            sources=sources,
+            chunks_used=len(sources),
+            tokens=count_tokens(text),
+            duplicates_dropped=len(results) - len(deduped),
+            chunks_merged=sum(len(span) - 1 for span in spans),
+            over_budget_dropped=over_budget
+        )
+        packed.tokens_saved = max(naive_tokens - packed.tokens, 0)
+        
+        with self._lock:
+            self.contexts += 1
+            self.tokens_in += naive_tokens
+            self.tokens_out += packed.tokens
+        return packed
+    
+    def stats(self) -> Dict:
+        return {
+            "contexts": self.contexts,
+            "tokens_in": self.tokens_in,
+            "tokens_out": self.tokens_out,
+            "tokens_saved": self.tokens_in - self.tokens_out,
+            "max_tokens": self.max_tokens,
+            "duplicate_threshold": self.duplicate_threshold
+        }
@@ -1,25 +1,46 @@
-from typing import List, Dict
+from typing import Dict, Iterator, List, Optional
 from pathlib import Path
 import pypdf
 from docx import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 class DocumentProcessor:
-    def __init__(self, chunk_size: int = 500, chunk_overlap: int = 50):
+    def __init__(self, chunk_size: int = 500, chunk_overlap: int = 50,
+                 buffer_size: int = 16384, read_size: int = 65536):
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
             separators=["\n\n", "\n", ".", "!", "?", ",", " ", ""]
         )
+        # Streaming: split once this many characters are buffered
+        self.buffer_size = max(buffer_size, chunk_size * 4)
+        self.read_size = read_size
     
-    def load_pdf(self, file_path: str) -> str:
-        """Load text from PDF"""
+    def iter_pdf_pages(self, file_path: str) -> Iterator[str]:
+        """Yield text from a PDF one page at a time"""
         with open(file_path, 'rb') as file:
             reader = pypdf.PdfReader(file)
-            text = ""
             for page in reader.pages:
-                text += page.extract_text()
-        return text
+                yield page.extract_text() or ""
+    
+    def iter_docx_paragraphs(self, file_path: str) -> Iterator[str]:
+        """Yield text from a DOCX one paragraph at a time"""
+        doc = Document(file_path)
+        for paragraph in doc.paragraphs:
+            yield paragraph.text + "\n"
+    
+    def iter_txt_blocks(self, file_path: str) -> Iterator[str]:
+        """Yield text from a TXT file in fixed-size blocks"""
+        with open(file_path, 'r', encoding='utf-8') as file:
+            while True:
+                block = file.read(self.read_size)
+                if not block:
+                    return
+                yield block
+    
+    def load_pdf(self, file_path: str) -> str:
+        """Load text from PDF"""
+        return "".join(self.iter_pdf_pages(file_path))
     
     def load_docx(self, file_path: str) -> str:
         """Load text from DOCX"""
@@ -31,33 +52,63 @@ class DocumentProcessor:
         with open(file_path, 'r', encoding='utf-8') as file:
             return file.read()
     
-    def process_document(self, file_path: str) -> List[Dict]:
-        """Process document and return chunks with metadata"""
+    def iter_text(self, file_path: str) -> Iterator[str]:
+        """Yield a document's text piece by piece based on its extension"""
         path = Path(file_path)
         
-        # Load based on extension
         if path.suffix == '.pdf':
-            text = self.load_pdf(file_path)
+            return self.iter_pdf_pages(file_path)
         elif path.suffix == '.docx':
-            text = self.load_docx(file_path)
+            return self.iter_docx_paragraphs(file_path)
         elif path.suffix == '.txt':
-            text = self.load_txt(file_path)
+            return self.iter_txt_blocks(file_path)
         else:
             raise ValueError(f"Unsupported file type: {path.suffix}")
+    
+    def iter_chunks(self, file_path: str, source: Optional[str] = None) -> Iterator[Dict]:
+        """Stream chunks with metadata without loading the whole document"""
+        source = source or Path(file_path).name
+        buffer = ""
+        chunk_index = 0
+        
+        for piece in self.iter_text(file_path):
+            buffer += piece
+            if len(buffer) < self.buffer_size:
+                continue
+            
+            # Emit everything but the last chunk, which may continue on the next
+            # page; carrying it keeps the splitter's overlap across boundaries
+            chunks = self.text_splitter.split_text(buffer)
+            for chunk in chunks[:-1]:
+                yield self._chunk(chunk, source, chunk_index)
+                chunk_index += 1
+            
+            if chunks:
+                tail_start = buffer.rfind(chunks[-1])
+                buffer = buffer[tail_start:] if tail_start >= 0 else chunks[-1]
+            else:
+                buffer = ""
         
-        # Split into chunks
-        chunks = self.text_splitter.split_text(text)
+        for chunk in self.text_splitter.split_text(buffer):
+            yield self._chunk(chunk, source, chunk_index)
+            chunk_index += 1
+    
+    def _chunk(self, text: str, source: str, chunk_index: int) -> Dict:
+        return {
+            "text": text,
+            "metadata": {
+                "source": source,
+                "chunk_index": chunk_index
+            }
+        }
+    
+    def process_document(self, file_path: str, source: Optional[str] = None) -> List[Dict]:
+        """Process document and return chunks with metadata"""
+        # Callers ingesting a temp copy pass the original name so chunk IDs stay stable
+        chunk_data = list(self.iter_chunks(file_path, source))
         
         # Add metadata
-        chunk_data = []
-        for idx, chunk in enumerate(chunks):
-            chunk_data.append({
-                "text": chunk,
-                "metadata": {
-                    "source": path.name,
-                    "chunk_index": idx,
-                    "total_chunks": len(chunks)
-                }
-            })
+        for chunk in chunk_data:
+            chunk["metadata"]["total_chunks"] = len(chunk_data)
         
         return chunk_data
@@ -0,0 +1,412 @@
+from app.core.vector_store import VectorStore, RetrievedChunk
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import math
+import os
+import re
+import threading
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+(?:[-.]\w+)*")
+
+# Very common words carry almost no BM25 signal but have the longest postings
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have how i in is it its of on or that
+the this to was were what when where which who why will with you your
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens; keeps codes like ERR-404 or v1.2 intact"""
+    return [
+        token for token in TOKEN_PATTERN.findall(text.lower())
+        if token not in STOPWORDS
+    ]
+
+class LexicalIndex:
+    """Incrementally updated BM25 inverted index
+
+    Unlike rank_bm25.BM25Okapi, documents can be added and removed without
+    rebuilding. Postings are append-only int32 arrays scored with NumPy at query
+    time; removals are tombstones until compact() runs. State is persisted as a
+    snapshot plus an append-only log of changes since that snapshot.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75,
+                 snapshot_every: int = 50000, common_term_ratio: float = 0.05):
+        self.path = Path(path) if path else None
+        self.k1 = k1
+        self.b = b
+        # Terms in more than this share of documents never widen the candidate set
+        self.common_term_ratio = common_term_ratio
+        self.snapshot_every = snapshot_every
+        self._lock = threading.RLock()
+        self._reset_state()
+        if self.path:
+            self._load()
+
+    def _reset_state(self):
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._point_ids: List[str] = []
+        self._doc_ids: Dict[str, int] = {}
+        self._lengths = array("i")
+        self._deleted = bytearray()
+        self._live_docs = 0
+        self._live_length = 0
+        self._log_ops = 0
+
+    def __len__(self) -> int:
+        return self._live_docs
+
+    def add(self, point_ids: Iterable[str], texts: Iterable[str]):
+        """Index documents; IDs already present are left as they are"""
+        entries = []
+        with self._lock:
+            for point_id, text in zip(point_ids, texts):
+                doc_id = self._doc_ids.get(point_id)
+                if doc_id is not None and not self._deleted[doc_id]:
+                    continue
+                terms = Counter(tokenize(text))
+                self._add(point_id, terms)
+                entries.append({"op": "add", "id": point_id, "terms": terms})
+            self._append_log(entries)
+
+    def _add(self, point_id: str, terms: Dict[str, int]):
+        doc_id = len(self._point_ids)
+        self._point_ids.append(point_id)
+        self._doc_ids[point_id] = doc_id
+        length = sum(terms.values())
+        self._lengths.append(length)
+        self._deleted.append(0)
+        self._live_docs += 1
+        self._live_length += length
+        for term, tf in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array("i"), array("i"))
+            postings[0].append(doc_id)
+            postings[1].append(tf)
+
+    def remove(self, point_ids: Iterable[str]):
+        """Tombstone documents by point ID"""
+        with self._lock:
+            removed = [point_id for point_id in point_ids if self._remove(point_id)]
+            if removed:
+                self._append_log([{"op": "remove", "ids": removed}])
+            if len(self._deleted) > 1000 and self._live_docs < len(self._deleted) // 2:
+                self.compact()
+
+    def _remove(self, point_id: str) -> bool:
+        doc_id = self._doc_ids.pop(point_id, None)
+        if doc_id is None or self._deleted[doc_id]:
+            return False
+        self._deleted[doc_id] = 1
+        self._live_docs -= 1
+        self._live_length -= self._lengths[doc_id]
+        return True
+
+    def point_ids(self) -> List[str]:
+        """IDs of all live documents"""
+        with self._lock:
+            return list(self._doc_ids)
+
+    def clear(self):
+        """Drop every document"""
+        with self._lock:
+            self._reset_state()
+            if self.path:
+                self.save()
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """Return up to `limit` (point_id, bm25_score) pairs, best first"""
+        terms = set(tokenize(query))
+        with self._lock:
+            if not terms or not self._live_docs:
+                return []
+
+            lengths = np.frombuffer(self._lengths, dtype=np.int32)
+            deleted = np.frombuffer(self._deleted, dtype=np.uint8).astype(bool)
+            avg_length = self._live_length / self._live_docs
+
+            # Rare terms first; they decide the candidate set
+            postings = sorted(
+                (self._postings[term] for term in terms if term in self._postings),
+                key=lambda p: len(p[0])
+            )
+            common_cutoff = self.common_term_ratio * len(lengths)
+            split = sum(1 for p in postings if len(p[0]) <= common_cutoff) or len(postings)
+            rare, common = postings[:split], postings[split:]
+
+            doc_parts, score_parts = [], []
+            for docs, tfs in rare:
+                docs = np.frombuffer(docs, dtype=np.int32)
+                tfs = np.frombuffer(tfs, dtype=np.int32)
+                live = ~deleted[docs]
+                docs, tfs = docs[live], tfs[live]
+                if len(docs):
+                    doc_parts.append(docs)
+                    score_parts.append(self._term_scores(tfs, lengths[docs], len(docs), avg_length))
+
+            if not doc_parts:
+                return []
+
+            docs = np.concatenate(doc_parts)
+            scores = np.concatenate(score_parts)
+            # Sum per-term contributions: sparse path for short postings, dense
+            # accumulator when postings cover a large share of the corpus
+            if len(docs) * 16 < len(lengths):
+                unique_docs, inverse = np.unique(docs, return_inverse=True)
+                totals = np.bincount(inverse, weights=scores)
+            else:
+                accumulator = np.bincount(docs, weights=scores)
+                unique_docs = np.flatnonzero(accumulator)
+                totals = accumulator[unique_docs]
+
+            # Very common terms only adjust the candidates' scores: postings are
+            # sorted by doc id, so a binary search avoids scanning them in full
+            for docs, tfs in common:
+                docs = np.frombuffer(docs, dtype=np.int32)
+                tfs = np.frombuffer(tfs, dtype=np.int32)
+                positions = np.searchsorted(docs, unique_docs)
+                positions[positions == len(docs)] = 0
+                found = docs[positions] == unique_docs
+                if found.any():
+                    # Tombstones are ignored in df here; negligible for such terms
+                    totals[found] += self._term_scores(
+                        tfs[positions[found]], lengths[unique_docs[found]], len(docs), avg_length
+                    )
+
+            if len(totals) > limit:
+                top = np.argpartition(-totals, limit)[:limit]
+            else:
+                top = np.arange(len(totals))
+            top = top[np.argsort(-totals[top])]
+            return [(self._point_ids[unique_docs[i]], float(totals[i])) for i in top]
+
+    def _term_scores(self, tfs: np.ndarray, lengths: np.ndarray, df: int,
+                     avg_length: float) -> np.ndarray:
+        """BM25 contribution of one term for each matching document"""
+        idf = math.log(1 + (self._live_docs - df + 0.5) / (df + 0.5))
+        tfs = tfs.astype(np.float32)
+        norm = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+        return idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+    def compact(self):
+        """Rebuild postings without tombstoned documents"""
+        with self._lock:
+            live = [
+                (point_id, doc_id) for doc_id, point_id in enumerate(self._point_ids)
+                if not self._deleted[doc_id]
+            ]
+            remap = {old: new for new, (_, old) in enumerate(live)}
+            postings = {}
+            for term, (docs, tfs) in self._postings.items():
+                new_docs, new_tfs = array("i"), array("i")
+                for doc_id, tf in zip(docs, tfs):
+                    if doc_id in remap:
+                        new_docs.append(remap[doc_id])
+                        new_tfs.append(tf)
+                if new_docs:
+                    postings[term] = (new_docs, new_tfs)
+
+            self._postings = postings
+            self._point_ids = [point_id for point_id, _ in live]
+            self._doc_ids = {point_id: idx for idx, point_id in enumerate(self._point_ids)}
+            self._lengths = array("i", (self._lengths[old] for _, old in live))
+            self._deleted = bytearray(len(live))
+            if self.path:
+                self.save()
+
+    # Persistence
+
+    @property
+    def _snapshot_path(self) -> Path:
+        return self.path / "snapshot.npz"
+
+    @property
+    def _log_path(self) -> Path:
+        return self.path / "log.jsonl"
+
+    def _append_log(self, entries: List[Dict]):
+        if not self.path or not entries:
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self._log_path, "a", encoding="utf-8") as log:
+            for entry in entries:
+                log.write(json.dumps(entry) + "\n")
+        self._log_ops += len(entries)
+        if self._log_ops >= self.snapshot_every:
+            self.save()
+
+    def save(self):
+        """Write a snapshot of the whole index and truncate the change log"""
+        if not self.path:
+            return
+        with self._lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            terms = list(self._postings)
+            sizes = [len(self._postings[term][0]) for term in terms]
+            offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+            np.cumsum(sizes, out=offsets[1:])
+            docs = np.concatenate(
+                [np.frombuffer(self._postings[t][0], dtype=np.int32) for t in terms]
+            ) if terms else np.zeros(0, dtype=np.int32)
+            tfs = np.concatenate(
+                [np.frombuffer(self._postings[t][1], dtype=np.int32) for t in terms]
+            ) if terms else np.zeros(0, dtype=np.int32)
+
+            tmp = self.path / "snapshot.tmp.npz"
+            np.savez(
+                tmp,
+                terms=np.array(terms, dtype=str),
+                offsets=offsets,
+                docs=docs,
+                tfs=tfs,
+                point_ids=np.array(self._point_ids, dtype=str),
+                lengths=np.frombuffer(self._lengths, dtype=np.int32),
+                deleted=np.frombuffer(self._deleted, dtype=np.uint8)
+            )
+            os.replace(tmp, self._snapshot_path)
+            if self._log_path.exists():
+                self._log_path.unlink()
+            self._log_ops = 0
+
+    def _load(self):
+        if self._snapshot_path.exists():
+            with np.load(self._snapshot_path) as snapshot:
+                offsets = snapshot["offsets"]
+                docs, tfs = snapshot["docs"], snapshot["tfs"]
+                for idx, term in enumerate(snapshot["terms"].tolist()):
+                    start, end = offsets[idx], offsets[idx + 1]
+                    self._postings[term] = (
+                        array("i", docs[start:end].tobytes()),
+                        array("i", tfs[start:end].tobytes())
+                    )
+                self._point_ids = snapshot["point_ids"].tolist()
+                self._lengths = array("i", snapshot["lengths"].tobytes())
+                self._deleted = bytearray(snapshot["deleted"].tobytes())
+
+            for doc_id, point_id in enumerate(self._point_ids):
+                if not self._deleted[doc_id]:
+                    self._doc_ids[point_id] = doc_id
+                    self._live_docs += 1
+                    self._live_length += self._lengths[doc_id]
+
+        if self._log_path.exists():
+            with open(self._log_path, encoding="utf-8") as log:
+                for line in log:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from a crash mid-write
+                        continue
+                    if entry["op"] == "add":
+                        if entry["id"] not in self._doc_ids:
+                            self._add(entry["id"], entry["terms"])
+                    else:
+                        for point_id in entry["ids"]:
+                            self._remove(point_id)
+                    self._log_ops += 1
+
+class HybridRetriever:
+    """Dense (Qdrant) + lexical (BM25) retrieval fused with reciprocal-rank fusion"""
+
+    def __init__(self, vector_store: VectorStore, lexical_index: LexicalIndex,
+                 score_threshold: float = 0.6, rrf_k: int = 60,
+                 candidate_multiplier: int = 4, lexical_min_score: float = 1.0):
+        self.vector_store = vector_store
+        self.lexical_index = lexical_index
+        self.score_threshold = score_threshold
+        self.rrf_k = rrf_k
+        self.candidate_multiplier = candidate_multiplier
+        self.lexical_min_score = lexical_min_score
+
+    def _lexical(self, question: str, limit: int) -> List[Tuple[str, float]]:
+        return [
+            hit for hit in self.lexical_index.search(question, limit)
+            if hit[1] >= self.lexical_min_score
+        ]
+
+    def _fuse(self, dense_results, lexical_results: List[Tuple[str, float]],
+              top_k: int) -> Tuple[List[str], Dict[str, float], Dict[str, object]]:
+        """Reciprocal-rank fusion: score = sum of 1 / (rrf_k + rank) over both lists"""
+        fused: Dict[str, float] = {}
+        dense_by_id = {}
+        for rank, result in enumerate(dense_results, start=1):
+            point_id = str(result.id)
+            dense_by_id[point_id] = result
+            fused[point_id] = fused.get(point_id, 0.0) + 1 / (self.rrf_k + rank)
+        for rank, (point_id, _) in enumerate(lexical_results, start=1):
+            fused[point_id] = fused.get(point_id, 0.0) + 1 / (self.rrf_k + rank)
+
+        ranked = sorted(fused, key=fused.get, reverse=True)[:top_k]
+        return ranked, fused, dense_by_id
+
+    def _merge(self, ranked: List[str], fused: Dict[str, float],
+               dense_by_id: Dict[str, object], fetched: List) -> List[RetrievedChunk]:
+        records = {str(record.id): record for record in fetched}
+        records.update(dense_by_id)
+        return [
+            RetrievedChunk(
+                id=point_id,
+                score=fused[point_id],
+                payload=records[point_id].payload or {},
+                vector=getattr(records[point_id], "vector", None)
+            )
+            for point_id in ranked
+            # Lexical hits whose point was deleted from the store are dropped
+            if point_id in records
+        ]
+
+    def retrieve(self, question: str, query_embedding: List[float],
+                 top_k: int = 5, with_vectors: bool = False) -> List[RetrievedChunk]:
+        """Retrieve top_k chunks for a question"""
+        candidates = top_k * self.candidate_multiplier
+        dense = self.vector_store.search(
+            query_embedding, limit=candidates, score_threshold=self.score_threshold,
+            with_vectors=with_vectors
+        )
+        lexical = self._lexical(question, candidates)
+        ranked, fused, dense_by_id = self._fuse(dense, lexical, top_k)
+        missing = [point_id for point_id in ranked if point_id not in dense_by_id]
+        fetched = self.vector_store.retrieve(missing, with_vectors) if missing else []
+        return self._merge(ranked, fused, dense_by_id, fetched)
+
+    async def aretrieve(self, question: str, query_embedding: List[float],
+                        top_k: int = 5, with_vectors: bool = False) -> List[RetrievedChunk]:
+        """Retrieve top_k chunks for a question without blocking the event loop"""
+        candidates = top_k * self.candidate_multiplier
+        dense = await self.vector_store.asearch(
+            query_embedding, limit=candidates, score_threshold=self.score_threshold,
+            with_vectors=with_vectors
+        )
+        # In-memory lookup; a few milliseconds even on large indexes
+        lexical = self._lexical(question, candidates)
+        ranked, fused, dense_by_id = self._fuse(dense, lexical, top_k)
+        missing = [point_id for point_id in ranked if point_id not in dense_by_id]
+        fetched = await self.vector_store.aretrieve(missing, with_vectors) if missing else []
+        return self._merge(ranked, fused, dense_by_id, fetched)
+
+    def sync_lexical_index(self, batch_size: int = 1000) -> Dict:
+        """Bring the lexical index in line with the vector store
+
+        Needed when points were written by another process (e.g. the bulk
+        ingestion script) or the index directory was lost.
+        """
+        stored = set()
+        batch_ids, batch_texts = [], []
+        for point_id, text in self.vector_store.iter_texts(batch_size):
+            stored.add(point_id)
+            batch_ids.append(point_id)
+            batch_texts.append(text)
+            if len(batch_ids) >= batch_size:
+                self.lexical_index.add(batch_ids, batch_texts)
+                batch_ids, batch_texts = [], []
+        self.lexical_index.add(batch_ids, batch_texts)
+
+        orphaned = [point_id for point_id in self.lexical_index.point_ids() if point_id not in stored]
+        self.lexical_index.remove(orphaned)
+        self.lexical_index.save()
+        return {"indexed": len(self.lexical_index), "removed": len(orphaned)}
@@ -1,20 +1,59 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import get_settings
 from app.core.embeddings import EmbeddingGenerator
 from app.core.vector_store import VectorStore
 from app.core.llm import OllamaLLM
+from app.core.batching import EmbeddingBatcher
+from app.core.cache import EmbeddingCache, SemanticAnswerCache
+from app.core.admission import LLMGate, Overloaded
 from app.services.document_processor import DocumentProcessor
 from app.services.rag_chain import RAGChain
+from app.services.retriever import HybridRetriever, LexicalIndex
+from app.services.context_packer import ContextPacker
 from app.models.schemas import QueryRequest, QueryResponse, IngestResponse
 import tempfile
 import os
+import json
+import asyncio
+from contextlib import asynccontextmanager, aclosing
+
+async def sync_lexical_index():
+    """Catch the lexical index up with points written by other processes"""
+    try:
+        result = await asyncio.to_thread(retriever.sync_lexical_index)
+        print(f"Lexical index synced: {result}")
+    except Exception as e:
+        print(f"Warning: Could not sync lexical index: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    sync_task = None
+    if retriever:
+        sync_task = asyncio.create_task(sync_lexical_index())
+    yield
+    if sync_task:
+        sync_task.cancel()
+    if retriever:
+        retriever.lexical_index.save()
+    # Release pooled connections and executor threads on shutdown
+    if embedding_batcher:
+        await embedding_batcher.aclose()
+    if llm:
+        await llm.aclose()
+    if vector_store:
+        await vector_store.aclose()
+    if embedding_generator:
+        embedding_generator.close()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="RAG Portfolio Project",
     description="Production-grade Retrieval-Augmented Generation system",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -30,22 +69,65 @@ app.add_middleware(
 settings = get_settings()
 
 try:
-    embedding_generator = EmbeddingGenerator(settings.embedding_model)
-    vector_store = VectorStore(
-        host=settings.qdrant_host,
-        port=settings.qdrant_port,
-        collection_name=settings.qdrant_collection_name,
-        vector_size=embedding_generator.dimension
+    embedding_generator = EmbeddingGenerator(
+        settings.embedding_model,
+        max_workers=settings.embedding_max_workers
+    )
+    vector_store = VectorStore.from_settings(settings, embedding_generator.dimension)
+    llm = OllamaLLM(
+        settings.ollama_base_url,
+        settings.ollama_model,
+        timeout=settings.ollama_timeout,
+        max_connections=settings.ollama_max_connections
     )
-    llm = OllamaLLM(settings.ollama_base_url, settings.ollama_model)
     document_processor = DocumentProcessor()
-    rag_chain = RAGChain(embedding_generator, vector_store, llm)
+    embedding_batcher = EmbeddingBatcher(
+        embedding_generator,
+        max_batch_size=settings.embedding_batch_max_size,
+        max_wait_ms=settings.embedding_batch_max_wait_ms
+    )
+    retriever = HybridRetriever(
+        vector_store,
+        LexicalIndex(settings.lexical_index_path),
+        score_threshold=settings.retrieval_score_threshold,
+        rrf_k=settings.rrf_k,
+        lexical_min_score=settings.lexical_min_score
+    ) if settings.hybrid_retrieval_enabled else None
+    rag_chain = RAGChain(
+        embedding_generator,
+        vector_store,
+        llm,
+        embedding_batcher,
+        embedding_cache=EmbeddingCache(
+            max_size=settings.embedding_cache_size,
+            ttl_seconds=settings.embedding_cache_ttl_seconds
+        ),
+        answer_cache=SemanticAnswerCache(
+            max_size=settings.answer_cache_size,
+            ttl_seconds=settings.answer_cache_ttl_seconds,
+            max_distance=settings.answer_cache_max_distance
+        ),
+        ingest_batch_size=settings.ingest_batch_size,
+        retriever=retriever,
+        score_threshold=settings.retrieval_score_threshold,
+        context_packer=ContextPacker(
+            max_tokens=settings.context_max_tokens,
+            duplicate_threshold=settings.context_duplicate_threshold
+        ),
+        llm_gate=LLMGate(
+            max_concurrency=settings.llm_max_concurrency,
+            max_queue=settings.llm_max_queue,
+            queue_timeout=settings.llm_queue_timeout
+        )
+    )
     
     print("✅ All components initialized successfully!")
 except Exception as e:
     print(f"❌ Error initializing components: {e}")
     # Create dummy components for now
     embedding_generator = None
+    embedding_batcher = None
+    retriever = None
     vector_store = None
     llm = None
     document_processor = None
@@ -86,32 +168,54 @@ async def health_check():
         "qdrant_connected": qdrant_status
     }
 
+@app.get("/stats")
+async def stats():
+    """Runtime statistics for batching, caching and context packing"""
+    if not embedding_batcher:
+        raise HTTPException(status_code=503, detail="RAG system not initialized")
+    return {
+        "embedding_batcher": embedding_batcher.stats(),
+        "embedding_cache": rag_chain.embedding_cache.stats(),
+        "answer_cache": rag_chain.answer_cache.stats(),
+        "context_packer": rag_chain.context_packer.stats(),
+        "llm_gate": rag_chain.llm_gate.stats()
+    }
+
 @app.post("/ingest/file", response_model=IngestResponse)
 async def ingest_file(file: UploadFile = File(...)):
     """Upload and ingest a document into the RAG system"""
     if not rag_chain:
         raise HTTPException(status_code=503, detail="RAG system not initialized")
     
+    tmp_path = None
     try:
-        # Save uploaded file temporarily
+        # Spool the upload to disk in fixed-size pieces
         with tempfile.NamedTemporaryFile(delete=False, suffix=file.filename) as tmp:
-            content = await file.read()
-            tmp.write(content)
             tmp_path = tmp.name
+            while chunk := await file.read(settings.upload_chunk_size):
+                tmp.write(chunk)
         
-        # Process document
-        chunks = document_processor.process_document(tmp_path)
-        
-        # Ingest into RAG system
-        result = rag_chain.ingest_documents(chunks)
-        
-        # Clean up
-        os.unlink(tmp_path)
+        # Stream chunks straight into batched embedding and upserts, off the event loop
+        chunks = document_processor.iter_chunks(tmp_path, source=file.filename)
+        result = await run_in_threadpool(rag_chain.ingest_stream, file.filename, chunks)
         
         return IngestResponse(**result, message=f"Successfully ingested {file.filename}")
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    finally:
+        # Clean up
+        if tmp_path:
+            os.unlink(tmp_path)
+
+def overloaded_error(e: Overloaded) -> HTTPException:
+    """429/503 with a Retry-After hint when the LLM is saturated"""
+    return HTTPException(
+        status_code=e.status_code,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)}
+    )
 
 @app.post("/query", response_model=QueryResponse)
 async def query(request: QueryRequest):
@@ -120,12 +224,57 @@ async def query(request: QueryRequest):
         raise HTTPException(status_code=503, detail="RAG system not initialized")
     
     try:
-        result = rag_chain.query(request.question, request.top_k)
+        result = await rag_chain.aquery(request.question, request.top_k)
         return QueryResponse(**result)
     
+    except Overloaded as e:
+        raise overloaded_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/query/stream")
+async def query_stream(request: QueryRequest, http_request: Request):
+    """Query the RAG system, streaming sources and then answer tokens"""
+    if not rag_chain:
+        raise HTTPException(status_code=503, detail="RAG system not initialized")
+    
+    # Server-sent events if the client asks for them, NDJSON otherwise
+    use_sse = "text/event-stream" in http_request.headers.get("accept", "")
+    
+    events = rag_chain.astream_query(request.question, request.top_k)
+    try:
+        # Pull the sources event before committing to a 200 so that an
+        # overloaded LLM gate can still be reported as 429/503
+        first_event = await anext(events)
+    except Overloaded as e:
+        await events.aclose()
+        raise overloaded_error(e)
+    except Exception as e:
+        await events.aclose()
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    def format_event(event: dict) -> str:
+        line = json.dumps(event)
+        return f"data: {line}\n\n" if use_sse else f"{line}\n"
+    
+    async def event_stream():
+        try:
+            # aclosing() tears down the Ollama stream as soon as we stop reading
+            async with aclosing(events):
+                yield format_event(first_event)
+                async for event in events:
+                    if await http_request.is_disconnected():
+                        break
+                    yield format_event(event)
+        except Exception as e:
+            yield format_event({"type": "error", "detail": str(e)})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream" if use_sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.delete("/reset")
 async def reset_collection():
     """Reset the vector collection (delete all documents)"""
@@ -133,8 +282,10 @@ async def reset_collection():
         raise HTTPException(status_code=503, detail="Vector store not initialized")
     
     try:
-        vector_store.client.delete_collection(settings.qdrant_collection_name)
-        vector_store._ensure_collection()
+        vector_store.reset()
+        if retriever:
+            retriever.lexical_index.clear()
+        rag_chain.invalidate_caches()
         return {"status": "success", "message": "Collection reset successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,265 @@
+"""Bulk-ingest a directory of documents into Qdrant.
+
+Parsing runs in a process pool, chunks from many files are embedded in large
+batches, and upserts run concurrently. Finished files are recorded in a
+checkpoint so an interrupted run picks up where it stopped:
+
+    uv run python scripts/ingest_documents.py data/documents --workers 8
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.config import get_settings
+from app.core.embeddings import EmbeddingGenerator
+from app.core.vector_store import VectorStore, chunk_point_id
+from app.services.document_processor import DocumentProcessor
+
+SUPPORTED_SUFFIXES = {".pdf", ".docx", ".txt"}
+
+_processor = None
+
+def _init_worker(chunk_size: int, chunk_overlap: int):
+    global _processor
+    _processor = DocumentProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+def parse_file(path: str, source: str) -> Tuple[str, List[Dict], float]:
+    """Parse one file in a worker process"""
+    started = time.perf_counter()
+    chunks = _processor.process_document(path, source=source)
+    return path, chunks, time.perf_counter() - started
+
+class Checkpoint:
+    """Tracks files that were fully ingested, keyed by path with size and mtime"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.files: Dict[str, Dict] = {}
+        if path.exists():
+            self.files = json.loads(path.read_text()).get("files", {})
+
+    @staticmethod
+    def fingerprint(path: Path) -> Dict:
+        stat = path.stat()
+        return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+    def is_done(self, path: Path) -> bool:
+        entry = self.files.get(str(path))
+        return entry is not None and entry["fingerprint"] == self.fingerprint(path)
+
+    def mark_done(self, path: Path, chunks: int):
+        self.files[str(path)] = {"fingerprint": self.fingerprint(path), "chunks": chunks}
+
+    def save(self):
+        # Write-then-rename so a crash never leaves a truncated checkpoint
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps({"files": self.files}))
+        os.replace(tmp, self.path)
+
+class BulkIngester:
+    def __init__(self, args: argparse.Namespace):
+        settings = get_settings()
+        self.args = args
+        self.root = Path(args.directory).resolve()
+        self.checkpoint = Checkpoint(Path(args.checkpoint))
+        self.embedding_generator = EmbeddingGenerator(settings.embedding_model)
+        self.vector_store = VectorStore.from_settings(settings, self.embedding_generator.dimension)
+        self.upsert_pool = ThreadPoolExecutor(max_workers=args.upsert_workers)
+        self.upserts = set()
+
+        # Chunks waiting for the next embedding batch: (path, point_id, chunk)
+        self.buffer: List[Tuple[str, str, Dict]] = []
+        # Chunks not yet upserted, per file; a file is done when this hits zero
+        self.remaining: Dict[str, int] = {}
+        self.chunk_counts: Dict[str, int] = {}
+
+        self.stage_time = {"parse": 0.0, "reconcile": 0.0, "embed": 0.0, "upsert": 0.0}
+        self.docs_done = 0
+        self.chunks_embedded = 0
+        self.chunks_skipped = 0
+        self.started = time.perf_counter()
+
+    def discover(self) -> List[Path]:
+        files = sorted(
+            path for path in self.root.rglob("*")
+            if path.is_file() and path.suffix in SUPPORTED_SUFFIXES
+        )
+        return [path for path in files if not self.checkpoint.is_done(path)]
+
+    def source_for(self, path: Path) -> str:
+        return path.relative_to(self.root).as_posix()
+
+    def run(self):
+        files = self.discover()
+        print(f"📂 {len(files)} files to ingest under {self.root}")
+
+        try:
+            with ProcessPoolExecutor(
+                max_workers=self.args.workers,
+                initializer=_init_worker,
+                initargs=(self.args.chunk_size, self.args.chunk_overlap)
+            ) as parse_pool:
+                # Keep a bounded window of parse jobs in flight
+                queue = iter(files)
+                parsing = set()
+                for path in queue:
+                    parsing.add(parse_pool.submit(parse_file, str(path), self.source_for(path)))
+                    if len(parsing) >= self.args.workers * 2:
+                        break
+
+                while parsing:
+                    done, parsing = wait(parsing, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        try:
+                            path, chunks, elapsed = future.result()
+                        except Exception as e:
+                            print(f"❌ Parse error: {e}")
+                            continue
+                        self.stage_time["parse"] += elapsed
+                        self.add_file(Path(path), chunks)
+
+                        next_path = next(queue, None)
+                        if next_path is not None:
+                            parsing.add(parse_pool.submit(
+                                parse_file, str(next_path), self.source_for(next_path)
+                            ))
+
+                    while len(self.buffer) >= self.args.embed_batch_size:
+                        self.embed_batch()
+
+            while self.buffer:
+                self.embed_batch()
+            self.drain_upserts(block_until=0)
+        finally:
+            # Only files whose chunks were all upserted are recorded
+            self.checkpoint.save()
+        self.report(final=True)
+
+    def add_file(self, path: Path, chunks: List[Dict]):
+        """Queue a parsed file's new chunks and drop chunks that no longer exist"""
+        started = time.perf_counter()
+        source = self.source_for(path)
+        existing = self.vector_store.get_source_points(source)
+
+        seen = set()
+        new_chunks = []
+        moved = {}
+        for chunk in chunks:
+            point_id = chunk_point_id(source, chunk["text"])
+            if point_id in seen:
+                continue
+            seen.add(point_id)
+            stored = existing.get(point_id)
+            if stored is None:
+                new_chunks.append((str(path), point_id, chunk))
+            elif (stored.get("chunk_index"), stored.get("total_chunks")) != (
+                chunk["metadata"]["chunk_index"], chunk["metadata"]["total_chunks"]
+            ):
+                moved[point_id] = {
+                    "chunk_index": chunk["metadata"]["chunk_index"],
+                    "total_chunks": chunk["metadata"]["total_chunks"]
+                }
+
+        stale_ids = [point_id for point_id in existing if point_id not in seen]
+        self.vector_store.update_payloads(moved)
+        self.vector_store.delete_points(stale_ids)
+        self.stage_time["reconcile"] += time.perf_counter() - started
+
+        self.chunks_skipped += len(seen) - len(new_chunks)
+        self.chunk_counts[str(path)] = len(chunks)
+        if new_chunks:
+            self.remaining[str(path)] = len(new_chunks)
+            self.buffer.extend(new_chunks)
+        else:
+            self.file_done(str(path))
+
+    def embed_batch(self):
+        batch = self.buffer[:self.args.embed_batch_size]
+        del self.buffer[:self.args.embed_batch_size]
+
+        started = time.perf_counter()
+        embeddings = self.embedding_generator.generate([chunk["text"] for _, _, chunk in batch])
+        self.stage_time["embed"] += time.perf_counter() - started
+        self.chunks_embedded += len(batch)
+
+        # Bound memory: wait for a slot before queueing another upsert
+        self.drain_upserts(block_until=self.args.upsert_workers * 2 - 1)
+        future = self.upsert_pool.submit(self.upsert, batch, embeddings)
+        self.upserts.add(future)
+
+    def upsert(self, batch: List[Tuple[str, str, Dict]], embeddings) -> List[Tuple[str, str, Dict]]:
+        started = time.perf_counter()
+        self.vector_store.add_documents(
+            [chunk["text"] for _, _, chunk in batch],
+            embeddings,
+            [chunk["metadata"] for _, _, chunk in batch],
+            ids=[point_id for _, point_id, _ in batch]
+        )
+        self.stage_time["upsert"] += time.perf_counter() - started
+        return batch
+
+    def drain_upserts(self, block_until: int):
+        """Collect finished upserts, waiting while more than block_until are in flight"""
+        while self.upserts:
+            done, self.upserts = wait(
+                self.upserts,
+                timeout=None if len(self.upserts) > block_until else 0,
+                return_when=FIRST_COMPLETED
+            )
+            if not done:
+                return
+            for future in done:
+                for path, _, _ in future.result():
+                    self.remaining[path] -= 1
+                    if self.remaining[path] == 0:
+                        del self.remaining[path]
+                        self.file_done(path)
+
+    def file_done(self, path: str):
+        self.checkpoint.mark_done(Path(path), self.chunk_counts.pop(path))
+        self.docs_done += 1
+        if self.docs_done % self.args.checkpoint_every == 0:
+            self.checkpoint.save()
+            self.report()
+
+    def report(self, final: bool = False):
+        elapsed = time.perf_counter() - self.started
+        stages = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in self.stage_time.items())
+        print(
+            f"{'✨ Done' if final else '⏳'} {self.docs_done} docs "
+            f"({self.docs_done / elapsed:.1f} docs/s), "
+            f"{self.chunks_embedded} chunks embedded ({self.chunks_embedded / elapsed:.1f} chunks/s), "
+            f"{self.chunks_skipped} unchanged | {stages} | wall {elapsed:.1f}s"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-ingest documents into the RAG vector store")
+    parser.add_argument("directory", nargs="?", default="data/documents")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2,
+                        help="parser processes")
+    parser.add_argument("--embed-batch-size", type=int, default=256)
+    parser.add_argument("--upsert-workers", type=int, default=4,
+                        help="concurrent Qdrant upserts")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--chunk-overlap", type=int, default=50)
+    parser.add_argument("--checkpoint", default=".ingest_checkpoint.json")
+    parser.add_argument("--checkpoint-every", type=int, default=100,
+                        help="save the checkpoint and report every N files")
+    parser.add_argument("--restart", action="store_true",
+                        help="ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    if args.restart and Path(args.checkpoint).exists():
+        Path(args.checkpoint).unlink()
+
+    BulkIngester(args).run()
+
+if __name__ == "__main__":
+    main()
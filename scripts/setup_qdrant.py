@@ -0,0 +1,53 @@
+"""Create the Qdrant collection, or migrate it to the current vector settings.
+
+Quantization, on-disk storage and HNSW parameters are fixed when a collection
+is created. After changing QDRANT_QUANTIZATION, QDRANT_ON_DISK or
+QDRANT_HNSW_* in .env, re-create the collection with its points preserved:
+
+    uv run python scripts/setup_qdrant.py --migrate
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.config import get_settings
+from app.core.vector_store import QdrantBackend
+
+def main():
+    parser = argparse.ArgumentParser(description="Set up the Qdrant collection")
+    parser.add_argument("--migrate", action="store_true",
+                        help="re-create the collection if its settings differ")
+    parser.add_argument("--force", action="store_true",
+                        help="re-create the collection even if the settings match")
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    settings = get_settings()
+    backend = QdrantBackend.from_settings(settings, settings.embedding_dimension)
+    print(
+        f"⚙️  quantization={backend.quantization} on_disk={backend.on_disk} "
+        f"hnsw_m={backend.hnsw_m} ef_construct={backend.hnsw_ef_construct}"
+    )
+
+    if backend.migration_pending():
+        print("🔁 Resuming an interrupted migration...")
+        print(f"✨ Migrated {backend.recreate(batch_size=args.batch_size)} points")
+        return
+
+    backend.ensure_collection()
+    if backend.config_matches() and not args.force:
+        print(f"✅ Collection '{settings.qdrant_collection_name}' is up to date "
+              f"({backend.count()} points)")
+        return
+    if not (args.migrate or args.force):
+        print("⚠️  Collection settings differ; re-run with --migrate to re-create it")
+        return
+
+    print(f"🔁 Re-creating '{settings.qdrant_collection_name}'...")
+    count = backend.recreate(batch_size=args.batch_size)
+    print(f"✨ Migrated {count} points")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,18 @@
+import asyncio
+import httpx
+import numpy as np
 import pytest
+from types import SimpleNamespace
 from app.core.embeddings import EmbeddingGenerator
+from app.core.llm import OllamaLLM
+from app.core.batching import EmbeddingBatcher
+from app.core.cache import EmbeddingCache, SemanticAnswerCache
+from app.core.vector_store import VectorStore, QdrantBackend, RetrievedChunk
+from app.core.local_index import LocalVectorIndex
+from app.services.rag_chain import RAGChain
+from app.services.document_processor import DocumentProcessor
+from app.services.retriever import HybridRetriever, LexicalIndex
+from app.services.context_packer import ContextPacker, count_tokens
 
 def test_embedding_generation():
     embedder = EmbeddingGenerator("sentence-transformers/all-MiniLM-L6-v2")
@@ -7,4 +20,257 @@ def test_embedding_generation():
     assert len(embeddings) == 1
     assert len(embeddings[0]) == 384
 
+class FakeEmbedder:
+    async def agenerate_single(self, text):
+        return [1.0, 0.0]
+
+class FakeVectorStore:
+    async def asearch(self, query_embedding, limit=5, score_threshold=0.7, with_vectors=False):
+        return [SimpleNamespace(
+            score=0.9,
+            payload={"text": "RAG retrieves context.", "source": "rag.txt", "chunk_index": 0}
+        )]
+
+def test_async_query_uses_pooled_ollama_client():
+    def handler(request):
+        assert request.url.path == "/api/generate"
+        return httpx.Response(200, json={"response": "RAG retrieves context first."})
+    
+    llm = OllamaLLM("http://ollama:11434", "llama3.1")
+    llm._async_client = httpx.AsyncClient(
+        base_url=llm.base_url,
+        transport=httpx.MockTransport(handler)
+    )
+    chain = RAGChain(FakeEmbedder(), FakeVectorStore(), llm)
+    
+    result = asyncio.run(chain.aquery("What is RAG?"))
+    assert result["answer"] == "RAG retrieves context first."
+    assert result["sources"][0]["source"] == "rag.txt"
+    assert result["context_used"] == 1
+
+def test_stream_query_yields_sources_before_tokens():
+    body = (
+        '{"response": "RAG ", "done": false}\n'
+        '{"response": "retrieves.", "done": false}\n'
+        '{"response": "", "done": true}\n'
+    )
+    llm = OllamaLLM("http://ollama:11434", "llama3.1")
+    llm._async_client = httpx.AsyncClient(
+        base_url=llm.base_url,
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, text=body))
+    )
+    chain = RAGChain(FakeEmbedder(), FakeVectorStore(), llm)
+    
+    async def collect():
+        return [event async for event in chain.astream_query("What is RAG?")]
+    
+    events = asyncio.run(collect())
+    assert [event["type"] for event in events] == ["sources", "token", "token", "done"]
+    assert "".join(e["content"] for e in events if e["type"] == "token") == "RAG retrieves."
+
+def test_batcher_coalesces_concurrent_queries():
+    class RecordingEmbedder:
+        def __init__(self):
+            self.calls = []
+        
+        async def agenerate(self, texts):
+            self.calls.append(list(texts))
+            return [[float(len(text))] for text in texts]
+    
+    embedder = RecordingEmbedder()
+    batcher = EmbeddingBatcher(embedder, max_batch_size=8, max_wait_ms=20)
+    
+    async def run():
+        texts = ["a" * n for n in range(1, 11)]
+        results = await asyncio.gather(*(batcher.agenerate_single(t) for t in texts))
+        await batcher.aclose()
+        return results
+    
+    results = asyncio.run(run())
+    assert results == [[float(n)] for n in range(1, 11)]
+    assert [len(call) for call in embedder.calls] == [8, 2]
+    stats = batcher.stats()
+    assert stats["requests"] == 10 and stats["batches"] == 2
+    assert stats["max_batch_size"] == 8
+
+def test_semantic_answer_cache_hits_until_invalidated():
+    calls = []
+    
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json={"response": "RAG retrieves context first."})
+    
+    llm = OllamaLLM("http://ollama:11434", "llama3.1")
+    llm._async_client = httpx.AsyncClient(
+        base_url=llm.base_url,
+        transport=httpx.MockTransport(handler)
+    )
+    chain = RAGChain(
+        FakeEmbedder(), FakeVectorStore(), llm,
+        embedding_cache=EmbeddingCache(max_size=10),
+        answer_cache=SemanticAnswerCache(max_size=10, max_distance=0.05)
+    )
+    
+    first = asyncio.run(chain.aquery("What is RAG?"))
+    second = asyncio.run(chain.aquery("what is   rag?"))
+    assert len(calls) == 1
+    assert second["cached"] and second["answer"] == first["answer"]
+    assert chain.embedding_cache.stats()["hits"] == 1
+    
+    chain.invalidate_caches()
+    asyncio.run(chain.aquery("What is RAG?"))
+    assert len(calls) == 2
+
+def test_embedding_cache_evicts_lru_entry():
+    cache = EmbeddingCache(max_size=2)
+    cache.put("a", [1.0])
+    cache.put("b", [2.0])
+    cache.get("a")
+    cache.put("c", [3.0])
+    assert cache.get("b") is None
+    assert cache.get("a") == [1.0] and cache.get("c") == [3.0]
+
+def test_reingest_only_embeds_changed_chunks():
+    class CountingEmbedder:
+        def __init__(self):
+            self.embedded = []
+        
+        def generate(self, texts):
+            self.embedded.extend(texts)
+            return [[float(len(text)), 1.0] for text in texts]
+    
+    def chunks(texts):
+        return [
+            {"text": text, "metadata": {"source": "doc.txt", "chunk_index": idx,
+                                        "total_chunks": len(texts)}}
+            for idx, text in enumerate(texts)
+        ]
+    
+    embedder = CountingEmbedder()
+    store = VectorStore("localhost", 6333, "test", 2, location=":memory:")
+    chain = RAGChain(embedder, store, llm=None)
+    
+    first = chain.ingest_documents(chunks(["alpha", "beta", "gamma"]))
+    again = chain.ingest_documents(chunks(["alpha", "beta", "gamma"]))
+    changed = chain.ingest_documents(chunks(["alpha", "gamma", "delta"]))
+    
+    assert first["chunks_added"] == 3
+    assert again["chunks_added"] == 0 and again["chunks_skipped"] == 3
+    assert changed["chunks_added"] == 1 and changed["chunks_deleted"] == 1
+    assert embedder.embedded == ["alpha", "beta", "gamma", "delta"]
+    
+    stored = store.get_source_points("doc.txt")
+    assert len(stored) == 3
+    assert sorted(p["chunk_index"] for p in stored.values()) == [0, 1, 2]
+
+def test_streaming_chunks_match_whole_document_split(tmp_path):
+    text = " ".join(f"Sentence number {n} talks about retrieval." for n in range(400))
+    path = tmp_path / "long.txt"
+    path.write_text(text, encoding="utf-8")
+    
+    processor = DocumentProcessor(chunk_size=200, chunk_overlap=20,
+                                  buffer_size=800, read_size=300)
+    streamed = [chunk["text"] for chunk in processor.iter_chunks(str(path))]
+    
+    assert all(len(chunk) <= 200 for chunk in streamed)
+    assert streamed[0] == processor.text_splitter.split_text(text)[0]
+    assert streamed[-1].endswith("Sentence number 399 talks about retrieval.")
+    covered = " ".join(streamed)
+    assert all(f"number {n} " in covered for n in range(400))
+
+def test_lexical_index_updates_incrementally_and_persists(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical"))
+    index.add(["a", "b", "c"], [
+        "Error ERR-404 means the page was not found",
+        "Retrieval augmented generation combines search and LLMs",
+        "Deep learning uses neural networks"
+    ])
+    assert index.search("what does ERR-404 mean?", 2)[0][0] == "a"
+    
+    index.remove(["a"])
+    index.add(["d"], ["ERR-404 is also logged by the proxy"])
+    assert [hit[0] for hit in index.search("ERR-404")] == ["d"]
+    
+    # Snapshot + log replay restore the same state
+    reloaded = LexicalIndex(str(tmp_path / "lexical"))
+    assert len(reloaded) == 3
+    assert [hit[0] for hit in reloaded.search("ERR-404")] == ["d"]
+    reloaded.save()
+    assert [hit[0] for hit in LexicalIndex(str(tmp_path / "lexical")).search("neural")] == ["c"]
+
+def test_hybrid_retriever_surfaces_exact_term_matches():
+    store = VectorStore("localhost", 6333, "hybrid", 2, location=":memory:")
+    texts = ["Product ZX-81 pricing sheet", "General overview of our catalog"]
+    vectors = [[0.0, 1.0], [1.0, 0.0]]
+    store.add_documents(texts, vectors, [{"source": "a.txt"}, {"source": "b.txt"}])
+    index = LexicalIndex()
+    index.add(list(store.get_source_points("a.txt")), [texts[0]])
+    
+    retriever = HybridRetriever(store, index, score_threshold=0.6, lexical_min_score=0.0)
+    results = retriever.retrieve("ZX-81 price", [1.0, 0.0], top_k=2)
+    
+    dense_only = store.search([1.0, 0.0], limit=2, score_threshold=0.6)
+    assert [r.payload["source"] for r in dense_only] == ["b.txt"]
+    assert {r.payload["source"] for r in results} == {"a.txt", "b.txt"}
+
+def test_local_index_matches_brute_force_and_persists(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(500, 16)).astype(np.float32)
+    ids = [str(n) for n in range(500)]
+    index = LocalVectorIndex(str(tmp_path / "vectors"), 16, initial_capacity=64)
+    index.upsert(ids, vectors.tolist(), [{"source": f"{n % 5}.txt", "text": str(n)} for n in range(500)])
+    index.delete(["7"])
+    
+    query = vectors[7] + 0.01
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = [str(n) for n in np.argsort(-(normed @ query)) if n != 7][:5]
+    assert [hit.id for hit in index.search(query.tolist(), 5, None)] == expected
+    
+    reloaded = LocalVectorIndex(str(tmp_path / "vectors"), 16)
+    assert reloaded.count() == 499
+    assert len(reloaded.get_source_points("3.txt")) == 100
+    assert [hit.id for hit in reloaded.search(query.tolist(), 5, None)] == expected
+    
+    # IVF probing every list is exact; the nearest neighbour survives a narrow probe
+    ivf = LocalVectorIndex(None, 16, ivf_lists=8, ivf_nprobe=8)
+    ivf.upsert(ids, vectors.tolist(), [{"source": "a.txt"}] * 500)
+    assert ivf._centroids is not None
+    exact = [hit.id for hit in reloaded.search(vectors[3].tolist(), 5, None)]
+    assert [hit.id for hit in ivf.search(vectors[3].tolist(), 5, None)] == exact
+    ivf.ivf_nprobe = 2
+    assert ivf.search(vectors[3].tolist(), 1, 0.5)[0].id == "3"
+
+def test_quantized_collection_recreate_keeps_points():
+    backend = QdrantBackend("localhost", 6333, "quantized", 2, location=":memory:",
+                            quantization="scalar", on_disk=True, hnsw_ef=64)
+    store = VectorStore("localhost", 6333, "quantized", 2, backend=backend)
+    store.add_documents(["north", "east"], [[0.0, 1.0], [1.0, 0.0]],
+                        [{"source": "a.txt"}, {"source": "b.txt"}])
+    
+    backend.quantization = "binary"
+    assert backend.recreate(batch_size=1) == 2
+    assert not backend.migration_pending()
+    hits = store.search([1.0, 0.1], limit=1, score_threshold=0.5)
+    assert [hit.payload["text"] for hit in hits] == ["east"]
+
+def test_context_packer_merges_neighbours_and_drops_duplicates():
+    def hit(text, source, index, vector, score):
+        return RetrievedChunk(id=f"{source}:{index}", score=score, vector=vector,
+                              payload={"text": text, "source": source, "chunk_index": index})
+    
+    results = [
+        hit("Qdrant stores vectors. It supports filtering by payload", "a.txt", 3, [1.0, 0.0, 0.0], 0.9),
+        hit("Qdrant stores vectors. It supports filtering by payload!", "b.txt", 0, [0.99, 0.01, 0.0], 0.85),
+        hit("supports filtering by payload fields and geo queries", "a.txt", 4, [0.0, 1.0, 0.0], 0.8),
+        hit(" ".join(["padding"] * 50), "c.txt", 0, [0.0, 0.0, 1.0], 0.7),
+    ]
+    packed = ContextPacker(max_tokens=30).pack(results)
+    
+    assert packed.text == "Qdrant stores vectors. It supports filtering by payload fields and geo queries"
+    assert [(s["source"], s["chunk_index"]) for s in packed.sources] == [("a.txt", 3), ("a.txt", 4)]
+    assert packed.duplicates_dropped == 1 and packed.chunks_merged == 1
+    assert packed.over_budget_dropped == 1
+    assert packed.tokens <= 30
+    assert packed.tokens_saved == count_tokens("\n\n".join(r.payload["text"] for r in results)) - packed.tokens
+
 # Run tests with: uv run pytest